@@ -1,29 +1,82 @@
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import MemorySaver
-from typing import TypedDict, Annotated, List, Optional
+# Heavy dependencies (LangGraph, LangChain integrations, HTTP clients) are
+# imported inside the functions that use them so that importing this module
+# stays cheap; clients, tools and graphs are built on first use.
+from typing import TYPE_CHECKING, TypedDict, Annotated, List, Optional
 from pydantic import BaseModel, Field
-from langgraph.types import Send
-from langchain_groq import ChatGroq
-from langchain.tools import Tool
-from langchain_community.utilities import GoogleSearchAPIWrapper
-from langchain_community.tools import WikipediaQueryRun
-from langchain_community.utilities import WikipediaAPIWrapper
 import operator
+import asyncio
+import inspect
+from collections import Counter
 from dotenv import load_dotenv
 import os
-import requests
-from datetime import datetime
-import json
+from datetime import datetime, timedelta
+import threading
+import time
+import uuid
+from research_engine import ResearchEngine
+from tool_cache import ToolCache
+from llm_cache import LLMCache, render_messages
+from workflow_registry import WorkflowRegistry
+from llm_scheduler import LLMScheduler
+from single_flight import SingleFlight, request_key
+from telemetry import count, telemetry, traced_node
+from deadlines import DeadlineExceeded, deadline_scope
+from context_packer import RESEARCH_SOURCE_TOKENS, SECTION_CONTEXT_TOKENS, pack_context, truncate_tokens
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import RunnableConfig
 
 load_dotenv()
 
+# Research sharding: split queries across N parallel research_worker branches
+RESEARCH_SHARDS = int(os.getenv("RESEARCH_SHARDS", "1"))
+RESEARCH_SHARD_MODE = os.getenv("RESEARCH_SHARD_MODE", "query")  # "query" or "section"
+MAX_RESEARCH_QUERIES = 15
+# Workflow variant: "enhanced" (research everything, then write) or
+# "pipelined" (each section writes as soon as its own research is back)
+RESEARCH_WORKFLOW = os.getenv("RESEARCH_WORKFLOW", "enhanced")
+# Per-report latency budget in seconds (0 = none); research must finish
+# within its share of it, so slow tools cannot hold up the writers
+REPORT_LATENCY_BUDGET = float(os.getenv("REPORT_LATENCY_BUDGET", "120"))
+RESEARCH_BUDGET_SHARE = float(os.getenv("RESEARCH_BUDGET_SHARE", "0.4"))
+# Start each query's research while the planner is still streaming the plan
+SPECULATIVE_RESEARCH = os.getenv("SPECULATIVE_RESEARCH", "0").lower() in ("1", "true", "yes")
+
+# Tool endpoints (overridable, e.g. to point at a local stub server)
+SERPAPI_URL = os.getenv("SERPAPI_URL", "https://serpapi.com/search")
+NEWSAPI_URL = os.getenv("NEWSAPI_URL", "https://newsapi.org/v2/everything")
+
+MODEL_NAME = 'openai/gpt-oss-20b'  # More reliable model-moonshotai/kimi-k2-instruct-0905
+
+# Lazily built shared instances (see get_llm, get_tools, ...)
+_instances = {}
+_instances_lock = threading.RLock()
+
+def _lazy(name: str, factory):
+    """Build a shared instance on first use, once per process"""
+    instance = _instances.get(name)
+    if instance is None:
+        with _instances_lock:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = _instances[name] = factory()
+    return instance
+
 # Initialize LLM
-llm = ChatGroq(
-    model_name='openai/gpt-oss-20b',  # More reliable model-moonshotai/kimi-k2-instruct-0905
-    api_key=os.getenv("GROQ_API_KEY"),
-    temperature=0.1  # Lower temperature for more consistent outputs
-)
+def get_llm():
+    def build():
+        from langchain_groq import ChatGroq
+        return ChatGroq(
+            model_name=MODEL_NAME,
+            api_key=os.getenv("GROQ_API_KEY"),
+            temperature=0.1,  # Lower temperature for more consistent outputs
+            max_retries=0  # retries and backoff are handled by the LLM scheduler
+        )
+    return _lazy("llm", build)
+
+# Rate limits, adaptive concurrency and retries for every model call
+def get_llm_scheduler():
+    return _lazy("llm_scheduler", LLMScheduler)
 
 # Enhanced Models
 class ResearchQuery(BaseModel):
@@ -45,152 +98,311 @@ class ResearchResult(BaseModel):
     source: str
     relevance_score: float
 
+class ResearchRef(BaseModel):
+    """A research finding as carried in graph state; its text lives in the blob store"""
+    query: str
+    content_ref: str
+    source: str
+    relevance_score: float
+
 # Enhanced State Management
 class State(TypedDict):
     topic: str
     user_context: Optional[str]
     sections: List[Section]
-    research_results: Annotated[List[ResearchResult], operator.add]
+    research_results: Annotated[List[ResearchRef], operator.add]
     completed_sections: Annotated[List, operator.add]
     final_report: str
     error_log: Annotated[List[str], operator.add]
+    run_summary: dict  # per-node timings, tool calls, LLM tokens and cache counters
 
 class WorkerState(TypedDict):
     section: Section
-    research_results: List[ResearchResult]
     completed_sections: Annotated[List, operator.add]
 
 class ResearchState(TypedDict):
     queries: List[ResearchQuery]
-    research_results: Annotated[List[ResearchResult], operator.add]
+    research_results: Annotated[List[ResearchRef], operator.add]
 
 # Tools Setup
-def setup_tools():
-    """Initialize research tools"""
+def setup_tools(cache: Optional[ToolCache] = None):
+    """Initialize research tools, optionally backed by a persistent result cache"""
+    from langchain_core.tools import Tool
+    from langchain_community.tools import WikipediaQueryRun
+    from langchain_community.utilities import WikipediaAPIWrapper
+    from requests import RequestException
+    from httpx import HTTPError
+    import http_client
+    
     tools = []
     
-    # Web Search Tool (using SerpAPI)
+    # Web Search Tool (SerpAPI over the pooled HTTP client)
+    def search_params(query: str, serpapi_key: str):
+        return {
+            'engine': 'google',
+            'google_domain': 'google.com',
+            'gl': 'us',
+            'hl': 'en',
+            'q': query,
+            'api_key': serpapi_key
+        }
+    
+    def search_snippets(data: dict):
+        """Answer box, knowledge graph, news and organic snippets from a SerpAPI response"""
+        answer_box = data.get('answer_box_list') or data.get('answer_box')
+        if isinstance(answer_box, list):
+            answer_box = answer_box[0] if answer_box else None
+        if isinstance(answer_box, dict):
+            for key in ('result', 'answer', 'snippet', 'snippet_highlighted_words'):
+                if answer_box.get(key):
+                    return answer_box[key]
+
+        snippets = []
+        knowledge_graph = data.get('knowledge_graph') or {}
+        title = knowledge_graph.get('title', '')
+        if knowledge_graph.get('description'):
+            snippets.append(knowledge_graph['description'])
+        for key, value in knowledge_graph.items():
+            if (isinstance(value, str) and key not in ('title', 'description')
+                    and not key.endswith(('_stick', '_link')) and not value.startswith('http')):
+                snippets.append(f"{title} {key}: {value}.")
+
+        for story in (data.get('top_stories') or data.get('news_results') or [])[:5]:
+            if isinstance(story, dict) and story.get('title'):
+                snippets.append(f"{story['title']} ({story.get('source', 'Unknown source')})")
+
+        for result in data.get('organic_results', []):
+            for key in ('snippet', 'snippet_highlighted_words', 'rich_snippet', 'link'):
+                if result.get(key):
+                    snippets.append(result[key])
+                    break
+
+        return snippets or "No good search result found"
+
+    def format_search(query: str, status_code: int, data) -> str:
+        if data is None:
+            return f"Error: SerpAPI returned status code {status_code}"
+        if 'error' in data:
+            return f"Error: SerpAPI error - {data['error']}"
+        results = search_snippets(data)
+        return f"Search results for '{query}':\n{results}"
+    
     def web_search(query: str) -> str:
         """Search the web for current information using SerpAPI"""
         try:
-            from langchain_community.utilities import SerpAPIWrapper
+            serpapi_key = os.getenv("SERPAPI_KEY")
+            if not serpapi_key:
+                return "Error: SERPAPI_KEY not found in environment variables"
+            
+            status_code, data = http_client.get_json(SERPAPI_URL, search_params(query, serpapi_key))
+            return format_search(query, status_code, data)
             
+        except DeadlineExceeded:
+            raise  # out of time, not a tool failure
+        except RequestException as e:
+            return f"Error making request to SerpAPI: {str(e)}"
+        except Exception as e:
+            return f"Error in web search: {str(e)}"
+    
+    async def aweb_search(query: str) -> str:
+        """Async web_search"""
+        try:
             serpapi_key = os.getenv("SERPAPI_KEY")
             if not serpapi_key:
-                return "Error: SERPER_API_KEY not found in environment variables"
+                return "Error: SERPAPI_KEY not found in environment variables"
             
-            search = SerpAPIWrapper(serpapi_api_key=serpapi_key)
-            results = search.run(query)
-            return f"Search results for '{query}':\n{results}"
+            status_code, data = await http_client.aget_json(SERPAPI_URL, search_params(query, serpapi_key))
+            return format_search(query, status_code, data)
             
-        except ImportError:
-            return "Error: SerpAPI wrapper not installed. Install with: pip install google-search-results"
+        except DeadlineExceeded:
+            raise  # out of time, not a tool failure
+        except HTTPError as e:
+            return f"Error making request to SerpAPI: {str(e)}"
         except Exception as e:
             return f"Error in web search: {str(e)}"
     
-    # Wikipedia Tool
+    # Wikipedia Tool (one wrapper instance reused for every query)
     wikipedia = WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper())
     
     # News API Tool (using NewsAPI.org)
-    def get_current_news(topic: str) -> str:
-        """Get current news about a topic using NewsAPI.org"""
-        try:
-            import requests
-            from datetime import datetime, timedelta
-            
-            newsapi_key = os.getenv("NEWSAPI_KEY")
-            if not newsapi_key:
-                return "Error: NEWSAPI_KEY not found in environment variables"
-            
-            # Calculate date range (last 7 days)
-            to_date = datetime.now().strftime('%Y-%m-%d')
-            from_date = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-            
-            # NewsAPI endpoint
-            url = "https://newsapi.org/v2/everything"
-            
-            params = {
-                'q': topic,
-                'apiKey': newsapi_key,
-                'from': from_date,
-                'to': to_date,
-                'sortBy': 'relevancy',
-                'language': 'en',
-                'pageSize': 5  # Limit to top 5 results
-            }
-            
-            response = requests.get(url, params=params)
-            
-            if response.status_code != 200:
-                return f"Error: NewsAPI returned status code {response.status_code}"
-            
-            data = response.json()
-            
-            if data['status'] != 'ok':
-                return f"Error: NewsAPI error - {data.get('message', 'Unknown error')}"
-            
-            articles = data.get('articles', [])
-            
-            if not articles:
-                return f"No recent news found for '{topic}'"
+    def news_params(topic: str, newsapi_key: str):
+        # Calculate date range (last 7 days)
+        to_date = datetime.now().strftime('%Y-%m-%d')
+        from_date = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+        
+        return {
+            'q': topic,
+            'apiKey': newsapi_key,
+            'from': from_date,
+            'to': to_date,
+            'sortBy': 'relevancy',
+            'language': 'en',
+            'pageSize': 5  # Limit to top 5 results
+        }
+    
+    def format_news(topic: str, status_code: int, data) -> str:
+        if status_code != 200:
+            return f"Error: NewsAPI returned status code {status_code}"
+        
+        if not data or data.get('status') != 'ok':
+            return f"Error: NewsAPI error - {(data or {}).get('message', 'Unknown error')}"
+        
+        articles = data.get('articles', [])
+        
+        if not articles:
+            return f"No recent news found for '{topic}'"
+        
+        # Format results
+        news_results = []
+        news_results.append(f"Recent News about '{topic}' (Last 7 days):\n")
+        
+        for i, article in enumerate(articles, 1):
+            title = article.get('title', 'No title')
+            description = article.get('description', 'No description')
+            source = article.get('source', {}).get('name', 'Unknown source')
+            published_at = article.get('publishedAt', '')
+            url = article.get('url', '')
             
-            # Format results
-            news_results = []
-            news_results.append(f"Recent News about '{topic}' (Last 7 days):\n")
+            # Format date
+            if published_at:
+                try:
+                    date_obj = datetime.fromisoformat(published_at.replace('Z', '+00:00'))
+                    formatted_date = date_obj.strftime('%B %d, %Y')
+                except ValueError:
+                    formatted_date = published_at
+            else:
+                formatted_date = 'Unknown date'
             
-            for i, article in enumerate(articles, 1):
-                title = article.get('title', 'No title')
-                description = article.get('description', 'No description')
-                source = article.get('source', {}).get('name', 'Unknown source')
-                published_at = article.get('publishedAt', '')
-                url = article.get('url', '')
-                
-                # Format date
-                if published_at:
-                    try:
-                        date_obj = datetime.fromisoformat(published_at.replace('Z', '+00:00'))
-                        formatted_date = date_obj.strftime('%B %d, %Y')
-                    except:
-                        formatted_date = published_at
-                else:
-                    formatted_date = 'Unknown date'
-                
-                news_results.append(f"""
+            news_results.append(f"""
 {i}. **{title}**
    - Source: {source}
    - Date: {formatted_date}
    - Summary: {description}
    - URL: {url}
 """)
+        
+        return "\n".join(news_results)
+    
+    def get_current_news(topic: str) -> str:
+        """Get current news about a topic using NewsAPI.org"""
+        try:
+            newsapi_key = os.getenv("NEWSAPI_KEY")
+            if not newsapi_key:
+                return "Error: NEWSAPI_KEY not found in environment variables"
+            
+            status_code, data = http_client.get_json(NEWSAPI_URL, news_params(topic, newsapi_key))
+            return format_news(topic, status_code, data)
+            
+        except DeadlineExceeded:
+            raise  # out of time, not a tool failure
+        except RequestException as e:
+            return f"Error making request to NewsAPI: {str(e)}"
+        except Exception as e:
+            return f"Error fetching news: {str(e)}"
+    
+    async def aget_current_news(topic: str) -> str:
+        """Async get_current_news"""
+        try:
+            newsapi_key = os.getenv("NEWSAPI_KEY")
+            if not newsapi_key:
+                return "Error: NEWSAPI_KEY not found in environment variables"
             
-            return "\n".join(news_results)
+            status_code, data = await http_client.aget_json(NEWSAPI_URL, news_params(topic, newsapi_key))
+            return format_news(topic, status_code, data)
             
-        except requests.exceptions.RequestException as e:
+        except DeadlineExceeded:
+            raise  # out of time, not a tool failure
+        except HTTPError as e:
             return f"Error making request to NewsAPI: {str(e)}"
         except Exception as e:
             return f"Error fetching news: {str(e)}"
     
+    funcs = {"web_search": web_search, "wikipedia": wikipedia.run, "current_news": get_current_news}
+    coroutines = {"web_search": aweb_search, "current_news": aget_current_news}
+    if cache is not None:
+        funcs = {name: cache.wrap(name, func) for name, func in funcs.items()}
+        coroutines = {name: cache.wrap_async(name, coro) for name, coro in coroutines.items()}
+    
     tools.extend([
-        Tool(name="web_search", description="Search the web for current information", func=web_search),
-        Tool(name="wikipedia", description="Search Wikipedia for encyclopedic information", func=wikipedia.run),
-        Tool(name="current_news", description="Get current news and trends", func=get_current_news)
+        Tool(name="web_search", description="Search the web for current information",
+             func=funcs["web_search"], coroutine=coroutines["web_search"]),
+        Tool(name="wikipedia", description="Search Wikipedia for encyclopedic information", func=funcs["wikipedia"]),
+        Tool(name="current_news", description="Get current news and trends",
+             func=funcs["current_news"], coroutine=coroutines["current_news"])
     ])
     
     return tools
 
-tools = setup_tools()
+def get_tool_cache():
+    return _lazy("tool_cache", ToolCache)
+
+def get_tools():
+    return _lazy("tools", lambda: setup_tools(cache=get_tool_cache()))
+
+# Concurrent research over the tools above; their coroutines serve async runs
+def get_research_engine():
+    return _lazy("research_engine", lambda: ResearchEngine(
+        {tool.name: tool.run for tool in get_tools()},
+        async_tools={tool.name: tool.arun for tool in get_tools() if tool.coroutine is not None}))
+
+# Per-query tool choice from observed hit rates and latency, with per-report budgets
+def get_tool_router():
+    def build():
+        from tool_router import ToolRouter
+        return ToolRouter(list(get_research_engine().tools))
+    return _lazy("tool_router", build)
+
+SOURCE_LABELS = {"wikipedia": "Wikipedia", "web_search": "Web", "current_news": "News"}
 
 # Enhanced Planner with Structured Output
-planner = llm.with_structured_output(Sections)
+def get_planner():
+    return _lazy("planner", lambda: get_llm().with_structured_output(Sections))
+
+# The same plan streamed as growing partial dicts, for speculative research
+def get_plan_stream():
+    def build():
+        from langchain_core.output_parsers.openai_tools import JsonOutputKeyToolsParser
+        return (get_llm().bind_tools([Sections], tool_choice="Sections")
+                | JsonOutputKeyToolsParser(key_name="Sections", first_tool_only=True))
+    return _lazy("plan_stream", build)
+
+# Exact cache for planner and writer generations, plus an optional semantic tier for plans
+def get_llm_cache():
+    return _lazy("llm_cache", LLMCache)
+
+# Durable checkpoints, so failed runs can be resumed (see resume_enhanced_agent)
+def get_checkpointer():
+    def build():
+        from checkpointer import SqliteCheckpointer
+        return SqliteCheckpointer()
+    return _lazy("checkpointer", build)
+
+# Research text, stored once by content hash and referenced from graph state
+def get_research_blobs():
+    def build():
+        from blob_store import BlobStore
+        return BlobStore()
+    return _lazy("research_blobs", build)
+
+def resolve_research(refs: List[ResearchRef]) -> List[ResearchResult]:
+    """Load the text behind research refs; findings whose blobs are gone are skipped"""
+    texts = get_research_blobs().get_many(ref.content_ref for ref in refs)
+    return [
+        ResearchResult(query=ref.query, content=texts[ref.content_ref], source=ref.source,
+                       relevance_score=ref.relevance_score)
+        for ref in refs if ref.content_ref in texts
+    ]
+
+def bypass_llm_cache(config: Optional["RunnableConfig"]) -> bool:
+    """Per-request opt-out, set with run_enhanced_agent(..., use_cache=False)"""
+    return not (config or {}).get("configurable", {}).get("use_llm_cache", True)
 
 # Core Nodes
-def enhanced_orchestrator(state: State):
-    """Enhanced orchestrator with better planning and context awareness"""
-    try:
-        topic = state['topic']
-        user_context = state.get('user_context', '')
-        
-        planning_prompt = f"""You are an expert research planner and strategist. 
+def planning_messages(topic: str, user_context: str):
+    """Planner prompt for a topic"""
+    from langchain_core.messages import HumanMessage, SystemMessage
+    
+    planning_prompt = f"""You are an expert research planner and strategist. 
         Create a comprehensive research plan for the topic: "{topic}"
         
         User Context: {user_context}
@@ -226,136 +438,433 @@ def enhanced_orchestrator(state: State):
         - Integration patterns
         - Troubleshooting guides
         """
+    
+    return [
+        SystemMessage(content=planning_prompt),
+        HumanMessage(content=f"Topic: {topic}\nContext: {user_context}")
+    ]
+
+def cached_plan(cached, messages, plan, config: "RunnableConfig"):
+    """The plan from `cached` (LLMCache.cached or acached), made by `plan` on a miss"""
+    return cached(
+        "planner", MODEL_NAME, render_messages(messages), plan,
+        encode=lambda plan: plan.model_dump_json(),
+        decode=Sections.model_validate_json,
+        semantic_text=messages[1].content,
+        bypass=bypass_llm_cache(config)
+    )
+
+def enhanced_orchestrator(state: State, config: "RunnableConfig"):
+    """Enhanced orchestrator with better planning and context awareness"""
+    try:
+        messages = planning_messages(state['topic'], state.get('user_context', ''))
+        if SPECULATIVE_RESEARCH:
+            plan = lambda: plan_speculatively(messages, config["configurable"]["thread_id"])
+        else:
+            plan = lambda: get_llm_scheduler().invoke(get_planner(), messages)
+        result = cached_plan(get_llm_cache().cached, messages, plan, config)
         
-        result = planner.invoke([
-            SystemMessage(content=planning_prompt),
-            HumanMessage(content=f"Topic: {topic}\nContext: {user_context}")
-        ])
+        return {'sections': result.sections}
+        
+    except Exception as e:
+        return {'error_log': [f"Orchestrator error: {str(e)}"]}
+
+async def aenhanced_orchestrator(state: State, config: "RunnableConfig"):
+    """Async enhanced_orchestrator"""
+    try:
+        messages = planning_messages(state['topic'], state.get('user_context', ''))
+        if SPECULATIVE_RESEARCH:
+            plan = lambda: aplan_speculatively(messages, config["configurable"]["thread_id"])
+        else:
+            plan = lambda: get_llm_scheduler().ainvoke(get_planner(), messages)
+        result = await cached_plan(get_llm_cache().acached, messages, plan, config)
         
         return {'sections': result.sections}
         
     except Exception as e:
         return {'error_log': [f"Orchestrator error: {str(e)}"]}
 
+def planned_queries(plan: dict) -> List[str]:
+    """Query strings found so far in a partial plan dict, in plan order"""
+    return [
+        query["query"]
+        for section in plan.get("sections") or [] if isinstance(section, dict)
+        for query in section.get("research_queries") or []
+        if isinstance(query, dict) and isinstance(query.get("query"), str)
+    ]
+
+def plan_speculatively(messages, thread_id: Optional[str] = None) -> Sections:
+    """Stream the plan and start researching each query as soon as it is complete.
+    
+    Research started for queries the final plan does not contain is
+    cancelled; the rest is picked up by the research phase through the
+    research engine's prefetched calls.
+    """
+    from langchain_core.runnables import RunnableLambda
+    
+    started = {}
+    
+    def stream_plan(messages):
+        plan = {}
+        for plan in get_plan_stream().stream(messages):
+            prefetch_planned(plan, started, thread_id)
+        return Sections.model_validate(plan)
+    
+    try:
+        result = get_llm_scheduler().invoke(RunnableLambda(stream_plan), messages)
+    except Exception:
+        drop_prefetched(started)
+        raise
+    settle_speculation(result, started, thread_id)
+    return result
+
+async def aplan_speculatively(messages, thread_id: Optional[str] = None) -> Sections:
+    """Async plan_speculatively; the prefetched calls still run on the research engine's pool"""
+    from langchain_core.runnables import RunnableLambda
+    
+    started = {}
+    
+    async def stream_plan(messages):
+        plan = {}
+        async for plan in get_plan_stream().astream(messages):
+            prefetch_planned(plan, started, thread_id)
+        return Sections.model_validate(plan)
+    
+    try:
+        result = await get_llm_scheduler().ainvoke(RunnableLambda(stream_plan), messages)
+    except Exception:
+        drop_prefetched(started)
+        raise
+    settle_speculation(result, started, thread_id)
+    return result
+
+def prefetch_planned(plan: dict, started: dict, thread_id: Optional[str] = None):
+    """Prefetch the complete queries of a partial plan, recording their keys in `started`"""
+    engine = get_research_engine()
+    # The last query may still be streaming in; every earlier one is complete
+    for query in planned_queries(plan)[:-1]:
+        if query not in started:
+            started[query] = engine.prefetch(query, tools_for_query(query, thread_id))
+
+def drop_prefetched(started: dict, keep=frozenset()) -> int:
+    """Cancel the prefetched calls in `started` except those in `keep`; returns how many"""
+    return get_research_engine().cancel(key for keys in started.values() for key in keys if key not in keep)
+
+def settle_speculation(result: Sections, started: dict, thread_id: Optional[str] = None):
+    """Cancel prefetched calls the final plan does not need"""
+    from tool_cache import normalize_query
+    
+    # Compare against the queries research will actually run, after merging
+    final = {(tool, normalize_query(q.query))
+             for section in optimize_research_plan(result.sections)[0] for q in section.research_queries
+             for tool in tools_for_query(q.query, thread_id)}
+    dropped = drop_prefetched(started, keep=final)
+    count("speculative_research_calls", sum(len(keys) for keys in started.values()))
+    count("speculative_research_cancelled", dropped)
+
+def optimize_research_plan(sections: List[Section], limit: int = MAX_RESEARCH_QUERIES):
+    """Merge near-duplicate queries across sections into canonical queries.
+    
+    Each section keeps one canonical query per cluster it asked for, so
+    its results are shared by every section that asked. Queries of
+    different kinds (news, reference, general) are never merged, so they
+    keep their own tool routing. Only the `limit`
+    highest-priority canonical queries are kept; returns the rewritten
+    sections and the text of the queries skipped over the limit.
+    """
+    from query_optimizer import cluster_queries
+    from tool_router import query_kind
+    
+    clusters = cluster_queries([(section.name, query) for section in sections for query in section.research_queries],
+                               partition=query_kind)
+    canonical = {}
+    for cluster in clusters[:limit]:
+        for member in cluster.members:
+            canonical[id(member)] = cluster.canonical
+    
+    optimized = []
+    for section in sections:
+        queries = []
+        for query in section.research_queries:
+            merged = canonical.get(id(query))
+            if merged is not None and all(merged is not q for q in queries):
+                queries.append(merged)
+        optimized.append(section.model_copy(update={"research_queries": queries}))
+    return optimized, [cluster.canonical.query for cluster in clusters[limit:]]
+
 def research_coordinator(state: State):
     """Coordinate research activities across all sections"""
     try:
-        all_queries = []
-        for section in state['sections']:
-            all_queries.extend(section.research_queries)
+        sections, skipped = optimize_research_plan(state['sections'])
+        count("research_queries_asked", sum(len(section.research_queries) for section in state['sections']))
+        count("research_queries_kept", len({id(q) for section in sections for q in section.research_queries}))
         
-        # Sort by priority
-        all_queries.sort(key=lambda x: x.priority, reverse=True)
-        
-        return {'research_results': [], 'queries': all_queries}
+        update = {'sections': sections}
+        if skipped:
+            update['error_log'] = [
+                f"Research plan: skipped {len(skipped)} lowest-priority queries over the limit of "
+                f"{MAX_RESEARCH_QUERIES}: " + "; ".join(skipped)
+            ]
+        return update
         
     except Exception as e:
         return {'error_log': [f"Research coordinator error: {str(e)}"]}
 
-def research_worker(state: ResearchState):
+def tools_for_query(query: str, thread_id: Optional[str] = None) -> List[str]:
+    """Tools worth calling for this query, within the report's tool budget"""
+    return get_tool_router().route(query, thread_id)
+
+def tool_failed(call) -> bool:
+    """Tools report failures as "Error..." strings as well as exceptions"""
+    return call.error is not None or call.output.startswith("Error")
+
+def run_research(queries: List[ResearchQuery], config: Optional["RunnableConfig"] = None):
+    """Research queries across the tools at once, one result per query that found anything.
+    
+    Returns the results and error_log notes about failing tools and
+    research cut short by the run's research deadline.
+    """
+    configurable = (config or {}).get("configurable", {})
+    plan = research_plan(queries, configurable.get("thread_id"))
+    
+    # Every (query, tool) pair runs at once; results keep the plan order.
+    # Tool calls see the deadline too, so HTTP timeouts shrink as it nears.
+    with deadline_scope(configurable.get("research_deadline")):
+        outcomes = get_research_engine().research(plan)
+    return collect_research(queries, outcomes)
+
+async def arun_research(queries: List[ResearchQuery], config: Optional["RunnableConfig"] = None):
+    """Async run_research: tool calls run on the event loop"""
+    configurable = (config or {}).get("configurable", {})
+    plan = research_plan(queries, configurable.get("thread_id"))
+    with deadline_scope(configurable.get("research_deadline")):
+        outcomes = await get_research_engine().aresearch(plan)
+    return collect_research(queries, outcomes)
+
+def research_plan(queries: List[ResearchQuery], thread_id: Optional[str] = None):
+    """(query, tools) pairs for the research engine"""
+    return [(query_obj.query, tools_for_query(query_obj.query, thread_id)) for query_obj in queries]
+
+def collect_research(queries: List[ResearchQuery], outcomes):
+    """Results and error_log notes from the queries' tool calls, which also feed the tool router"""
+    router = get_tool_router()
+    for calls in outcomes:
+        for call in calls:
+            # Cache hits would skew the latencies and replay hits already counted
+            if not (call.timed_out or call.rejected or call.cached):
+                router.record(call.tool, call.query, call.output, call.elapsed)
+    
+    errors = []
+    failures = {}
+    for calls in outcomes:
+        for call in calls:
+            if tool_failed(call) and not call.timed_out:
+                failures.setdefault(call.tool, []).append(call)
+    for tool, calls in failures.items():
+        reason = calls[0].error or calls[0].output.splitlines()[0]
+        errors.append(f"Research tool {tool} failed for {len(calls)} queries: {reason}")
+    late = [call for calls in outcomes for call in calls if call.timed_out]
+    if late:
+        errors.append(
+            f"Research deadline: {len(late)} tool calls for {len({call.query for call in late})} queries "
+            f"did not finish within the latency budget; continuing with partial research"
+        )
+    
+    results = []
+    for query_obj, calls in zip(queries, outcomes):
+        research_content = [
+            f"{SOURCE_LABELS[call.tool]}: {truncate_tokens(call.output, RESEARCH_SOURCE_TOKENS)}"
+            for call in calls if not tool_failed(call)
+        ]
+        
+        if research_content:
+            results.append(ResearchResult(
+                query=query_obj.query,
+                content="\n\n".join(research_content),
+                source=", ".join(SOURCE_LABELS[call.tool] for call in calls if not tool_failed(call)),
+                relevance_score=query_obj.priority / 5.0
+            ))
+    return results, errors
+
+def store_research(results: List[ResearchResult]) -> List[ResearchRef]:
+    """Move research text into the blob store, keeping refs for graph state"""
+    blobs = get_research_blobs()
+    return [
+        ResearchRef(query=r.query, content_ref=blobs.put(r.content), source=r.source,
+                    relevance_score=r.relevance_score)
+        for r in results
+    ]
+
+def research_worker(state: ResearchState, config: "RunnableConfig"):
     """Perform research using available tools"""
     try:
-        results = []
-        
-        for query_obj in state.get('queries', [])[:10]:  # Limit concurrent queries
-            query = query_obj.query
-            
-            # Use multiple tools for comprehensive research
-            research_content = []
-            
-            # Wikipedia search
-            try:
-                wiki_result = tools[1].run(query)
-                research_content.append(f"Wikipedia: {wiki_result[:500]}...")
-            except:
-                pass
-            
-            # Web search
-            try:
-                web_result = tools[0].run(query)
-                research_content.append(f"Web: {web_result[:500]}...")
-            except:
-                pass
-            
-            # News search for current topics
-            if any(keyword in query.lower() for keyword in ['current', 'latest', '2024', '2025', 'recent']):
-                try:
-                    news_result = tools[2].run(query)
-                    research_content.append(f"News: {news_result[:500]}...")
-                except:
-                    pass
-            
-            if research_content:
-                combined_content = "\n\n".join(research_content)
-                results.append(ResearchResult(
-                    query=query,
-                    content=combined_content,
-                    source="multi-source",
-                    relevance_score=query_obj.priority / 5.0
-                ))
-        
-        return {'research_results': results}
+        results, errors = run_research(state.get('queries', []), config)
+        return {'research_results': store_research(results), 'error_log': errors}
         
     except Exception as e:
         return {'error_log': [f"Research worker error: {str(e)}"]}
 
-def enhanced_section_writer(state: WorkerState):
-    """Write sections with research-backed content"""
+async def aresearch_worker(state: ResearchState, config: "RunnableConfig"):
+    """Async research_worker"""
     try:
-        section = state['section']
-        research_results = state.get('research_results', [])
-        
-        # Filter relevant research for this section
-        relevant_research = [r for r in research_results 
-                           if any(q.query in r.query for q in section.research_queries)]
-        
-        research_context = "\n\n".join([
-            f"Research Query: {r.query}\nFindings: {r.content[:800]}..."
-            for r in relevant_research[:3]  # Top 3 most relevant
-        ])
-        
-        writing_prompt = f"""You are a senior technical writer and domain expert.
-        
-        Write a comprehensive section for: "{section.name}"
-        Description: {section.description}
-        Section Type: {section.section_type}
-        
-        RESEARCH CONTEXT:
-        {research_context}
-        
-        WRITING GUIDELINES:
-        - Use the research findings to provide accurate, current information
-        - Include specific examples, statistics, and real-world cases
-        - Structure with clear headings (##, ###) and formatting
-        - Add code blocks for technical content using ```language
-        - Use bullet points and numbered lists appropriately
-        - Include > blockquotes for key insights or warnings
-        - Ensure content is actionable and valuable
-        - Cite sources naturally within the text
-        - Maintain professional yet engaging tone
-        
-        TECHNICAL REQUIREMENTS (if applicable):
-        - Provide working code examples
-        - Explain implementation steps clearly
-        - Include error handling and best practices
-        - Add performance considerations
-        - Show integration patterns
-        
-        Write a detailed, well-researched section (800-1500 words) that thoroughly covers the topic.
-        """
-        
-        result = llm.invoke([
-            SystemMessage(content=writing_prompt),
-            HumanMessage(content=f"Section: {section.name}\nFocus: {section.description}")
-        ])
-        
-        return {'completed_sections': [result.content]}
+        results, errors = await arun_research(state.get('queries', []), config)
+        return {'research_results': await asyncio.to_thread(store_research, results), 'error_log': errors}
         
     except Exception as e:
-        return {'error_log': [f"Section writer error: {str(e)}"]}
+        return {'error_log': [f"Research worker error: {str(e)}"]}
+
+def section_focus(section: Section) -> str:
+    """Text a section's research is retrieved and ranked against"""
+    return " ".join([section.name, section.description] + [q.query for q in section.research_queries])
+
+def enhanced_section_writer(state: WorkerState, config: "RunnableConfig"):
+    """Write sections with research-backed content"""
+    # No try/except here: a failed writer fails the run, and the checkpoint
+    # keeps the research and the other sections so resume_enhanced_agent
+    # only reruns the writers that did not finish
+    section = state['section']
+    focus = section_focus(section)
+    relevant_research = indexed_research(focus, config)
+    
+    return {'completed_sections': [write_section(section, relevant_research, focus, config)]}
+
+async def aenhanced_section_writer(state: WorkerState, config: "RunnableConfig"):
+    """Async enhanced_section_writer; failures fail the run the same way"""
+    section = state['section']
+    focus = section_focus(section)
+    relevant_research = indexed_research(focus, config)
+    
+    return {'completed_sections': [await awrite_section(section, relevant_research, focus, config)]}
+
+def indexed_research(focus: str, config: "RunnableConfig"):
+    """The closest research chunks to `focus` in the run's index"""
+    from research_index import research_indexes
+    
+    index = research_indexes.get(config["configurable"]["thread_id"])
+    return index.search(focus) if index is not None else []
+
+def write_section(section: Section, relevant_research, focus: str, config: "RunnableConfig") -> str:
+    """Generate one section's markdown from its retrieved research"""
+    messages = section_messages(section, relevant_research, focus)
+    result = cached_section(get_llm_cache().cached, messages,
+                            lambda: get_llm_scheduler().invoke(get_llm(), messages), config)
+    return result.content
+
+async def awrite_section(section: Section, relevant_research, focus: str, config: "RunnableConfig") -> str:
+    """Async write_section"""
+    messages = section_messages(section, relevant_research, focus)
+    result = await cached_section(get_llm_cache().acached, messages,
+                                  lambda: get_llm_scheduler().ainvoke(get_llm(), messages), config)
+    return result.content
+
+def section_messages(section: Section, relevant_research, focus: str):
+    """Writer prompt for one section"""
+    from langchain_core.messages import HumanMessage, SystemMessage
+    
+    # Most relevant, deduplicated findings that fit the section's token budget
+    research_context = pack_context(relevant_research, focus, SECTION_CONTEXT_TOKENS)
+    
+    writing_prompt = f"""You are a senior technical writer and domain expert.
+    
+    Write a comprehensive section for: "{section.name}"
+    Description: {section.description}
+    Section Type: {section.section_type}
+    
+    RESEARCH CONTEXT:
+    {research_context}
+    
+    WRITING GUIDELINES:
+    - Use the research findings to provide accurate, current information
+    - Include specific examples, statistics, and real-world cases
+    - Structure with clear headings (##, ###) and formatting
+    - Add code blocks for technical content using ```language
+    - Use bullet points and numbered lists appropriately
+    - Include > blockquotes for key insights or warnings
+    - Ensure content is actionable and valuable
+    - Cite sources naturally within the text
+    - Maintain professional yet engaging tone
+    
+    TECHNICAL REQUIREMENTS (if applicable):
+    - Provide working code examples
+    - Explain implementation steps clearly
+    - Include error handling and best practices
+    - Add performance considerations
+    - Show integration patterns
+    
+    Write a detailed, well-researched section (800-1500 words) that thoroughly covers the topic.
+    """
+    
+    return [
+        SystemMessage(content=writing_prompt),
+        HumanMessage(content=f"Section: {section.name}\nFocus: {section.description}")
+    ]
+
+def cached_section(cached, messages, generate, config: "RunnableConfig"):
+    """The section message from `cached` (LLMCache.cached or acached), made by `generate` on a miss.
+    
+    Exact matches only: a section depends on its research as much as on its
+    name, and a near match on the name alone would hand back a section
+    written for another topic.
+    """
+    from langchain_core.messages import AIMessage
+    
+    return cached(
+        "section_writer", MODEL_NAME, render_messages(messages), generate,
+        encode=lambda message: message.content,
+        decode=lambda content: AIMessage(content=content),
+        bypass=bypass_llm_cache(config)
+    )
 
-def quality_synthesizer(state: State):
+def section_pipeline(state: WorkerState, config: "RunnableConfig"):
+    """Research one section's own queries, then write it (pipelined workflow).
+    
+    Each section starts writing as soon as its research is back instead of
+    waiting for every section's research; sections without queries start
+    right after planning. Queries shared with other sections still hit the
+    backends once thanks to the research engine's single-flight.
+    """
+    from research_index import ResearchIndex
+    
+    section = state['section']
+    focus = section_focus(section)
+    update = {'research_results': [], 'error_log': []}
+    relevant_research = []
+    if section.research_queries:
+        try:
+            results, errors = run_research(section.research_queries, config)
+            update['research_results'] = store_research(results)
+            update['error_log'].extend(errors)
+            relevant_research = ResearchIndex(results).search(focus)
+        except Exception as e:
+            update['error_log'].append(f"Research error for {section.name}: {str(e)}")
+    
+    update['completed_sections'] = [write_section(section, relevant_research, focus, config)]
+    return update
+
+async def asection_pipeline(state: WorkerState, config: "RunnableConfig"):
+    """Async section_pipeline"""
+    from research_index import ResearchIndex
+    
+    section = state['section']
+    focus = section_focus(section)
+    update = {'research_results': [], 'error_log': []}
+    relevant_research = []
+    if section.research_queries:
+        try:
+            results, errors = await arun_research(section.research_queries, config)
+            update['research_results'] = await asyncio.to_thread(store_research, results)
+            update['error_log'].extend(errors)
+            relevant_research = await asyncio.to_thread(lambda: ResearchIndex(results).search(focus))
+        except Exception as e:
+            update['error_log'].append(f"Research error for {section.name}: {str(e)}")
+    
+    update['completed_sections'] = [await awrite_section(section, relevant_research, focus, config)]
+    return update
+
+def quality_synthesizer(state: State, config: "RunnableConfig"):
     """Synthesize and quality-check the final report"""
+    from research_index import research_indexes
+    
     try:
         completed_sections = state['completed_sections']
         topic = state['topic']
@@ -368,11 +877,26 @@ def quality_synthesizer(state: State):
             heading = next((line.replace('##', '').strip() for line in lines if line.startswith('##')), f"Section {i}")
             toc += f"{i}. [{heading}](#{heading.lower().replace(' ', '-')})\n"
         
+        # Summarize the sources the run's research actually drew on
+        index = research_indexes.get(config["configurable"]["thread_id"])
+        if index is not None and len(index.store):
+            store = index.store
+            sources = ", ".join(name for name, _ in store.source_counts().most_common())
+            sources_line = f"*Research Sources: {sources} ({len(store)} findings across {len(store.queries)} queries)*"
+        elif state.get('research_results'):
+            # No run-wide index (pipelined runs): count sources from the research refs
+            refs = state['research_results']
+            counts = Counter(label for ref in refs for label in ref.source.split(", ") if label)
+            sources = ", ".join(name for name, _ in counts.most_common())
+            sources_line = f"*Research Sources: {sources} ({len(refs)} findings across {len({r.query for r in refs})} queries)*"
+        else:
+            sources_line = "*Research Sources: Multi-source analysis including web search, Wikipedia, and current news*"
+        
         # Add metadata and introduction
         metadata = f"""# Research Report: {topic}
         
 *Generated on: {datetime.now().strftime('%B %d, %Y')}*
-*Research Sources: Multi-source analysis including web search, Wikipedia, and current news*
+{sources_line}
 
 ---
 
@@ -402,104 +926,432 @@ Key takeaways include the importance of understanding both theoretical foundatio
 """
             full_content += conclusion
         
-        return {'final_report': full_content}
+        return {
+            'final_report': full_content,
+            'run_summary': telemetry.trace(config["configurable"]["thread_id"]).summary()
+        }
         
     except Exception as e:
         return {'error_log': [f"Synthesizer error: {str(e)}"]}
 
+async def aquality_synthesizer(state: State, config: "RunnableConfig"):
+    """quality_synthesizer on the event loop; it only formats what is already in state"""
+    return quality_synthesizer(state, config)
+
 # Routing Functions
+def shard_queries(sections: List[Section], shards: int = 1, mode: str = "query",
+                  limit: int = MAX_RESEARCH_QUERIES) -> List[List[ResearchQuery]]:
+    """Split the deduplicated research queries into at most `shards` groups.
+    
+    Always returns at least one group, empty when no section asked for
+    research, so the graph still runs a worker and reaches the writers.
+    """
+    # Remove duplicates while preserving order, remembering the section asking first
+    unique = []
+    seen = set()
+    for i, section in enumerate(sections):
+        for query in section.research_queries:
+            if query.query not in seen:
+                unique.append((i, query))
+                seen.add(query.query)
+    
+    # Highest priority first; research_coordinator reports anything over the limit
+    unique.sort(key=lambda item: -item[1].priority)
+    unique = unique[:limit]
+    
+    shards = max(1, shards)
+    buckets = [[] for _ in range(shards)]
+    if mode == "section":
+        # Keep each section's queries together, filling the lightest shard first
+        groups = {}
+        for i, query in unique:
+            groups.setdefault(i, []).append(query)
+        for _, group in sorted(groups.items()):
+            min(buckets, key=len).extend(group)
+    else:
+        for n, (_, query) in enumerate(unique):
+            buckets[n % shards].append(query)
+    
+    return [bucket for bucket in buckets if bucket] or [[]]
+
 def route_to_research(state: State):
-    """Route to research workers"""
+    """Route to research workers, one branch per shard"""
+    from langgraph.types import Send
+    
     try:
         sections = state.get('sections', [])
         if not sections:
             return []
         
-        # Collect all unique research queries
-        all_queries = []
-        for section in sections:
-            all_queries.extend(section.research_queries)
-        
-        # Remove duplicates while preserving order
-        unique_queries = []
-        seen = set()
-        for query in all_queries:
-            if query.query not in seen:
-                unique_queries.append(query)
-                seen.add(query.query)
-        
-        return [Send("research_worker", {"queries": unique_queries[:15]})]  # Limit queries
+        shards = shard_queries(sections, RESEARCH_SHARDS, RESEARCH_SHARD_MODE)
+        return [Send("research_worker", {"queries": queries}) for queries in shards]
         
     except Exception as e:
         return []
 
+def research_join(state: State, config: "RunnableConfig"):
+    """Wait for every research branch, then index the merged results once for the writers"""
+    from research_index import research_indexes
+    
+    try:
+        research_indexes.build(config["configurable"]["thread_id"], resolve_research(state.get('research_results', [])))
+        return {}
+    except Exception as e:
+        return {'error_log': [f"Research index error: {str(e)}"]}
+
 def route_to_writers(state: State):
-    """Route to section writers with research results"""
+    """Route to section writers; each retrieves its own research from the run's index"""
+    from langgraph.types import Send
+    
     try:
         sections = state.get('sections', [])
-        research_results = state.get('research_results', [])
         
-        return [Send("enhanced_section_writer", {
-            "section": section,
-            "research_results": research_results
-        }) for section in sections]
+        return [Send("enhanced_section_writer", {"section": section}) for section in sections]
         
     except Exception as e:
         return []
 
 # Build Enhanced Graph
+def add_traced_node(graph, name: str, node, anode=None):
+    """Add a node timed on the run's trace; `anode`, its coroutine version, runs under ainvoke"""
+    schema = next(iter(inspect.signature(node).parameters.values())).annotation
+    graph.add_node(name, traced_node(name, node, anode), input_schema=schema)
+
 def build_enhanced_workflow():
     """Build the complete workflow graph"""
+    from langgraph.graph import StateGraph, START, END
     
     graph = StateGraph(State)
     
-    # Add nodes
-    graph.add_node("enhanced_orchestrator", enhanced_orchestrator)
-    graph.add_node("research_worker", research_worker)
-    graph.add_node("enhanced_section_writer", enhanced_section_writer)
-    graph.add_node("quality_synthesizer", quality_synthesizer)
+    # Add nodes, each timed on the run's trace. Nodes without a coroutine
+    # version only do local work and run in LangGraph's executor under ainvoke.
+    for name, node, anode in [
+        ("enhanced_orchestrator", enhanced_orchestrator, aenhanced_orchestrator),
+        ("research_coordinator", research_coordinator, None),
+        ("research_worker", research_worker, aresearch_worker),
+        ("research_join", research_join, None),
+        ("enhanced_section_writer", enhanced_section_writer, aenhanced_section_writer),
+        ("quality_synthesizer", quality_synthesizer, aquality_synthesizer),
+    ]:
+        add_traced_node(graph, name, node, anode)
     
     # Define edges
     graph.add_edge(START, "enhanced_orchestrator")
-    graph.add_conditional_edges("enhanced_orchestrator", route_to_research, ["research_worker"])
-    graph.add_conditional_edges("research_worker", route_to_writers, ["enhanced_section_writer"])
+    graph.add_edge("enhanced_orchestrator", "research_coordinator")
+    graph.add_conditional_edges("research_coordinator", route_to_research, ["research_worker"])
+    graph.add_edge("research_worker", "research_join")
+    graph.add_conditional_edges("research_join", route_to_writers, ["enhanced_section_writer"])
     graph.add_edge("enhanced_section_writer", "quality_synthesizer")
     graph.add_edge("quality_synthesizer", END)
     
-    return graph.compile(checkpointer=MemorySaver())
+    return graph.compile(checkpointer=get_checkpointer())
 
-workflow = build_enhanced_workflow()
-workflow
+def route_to_sections(state: State):
+    """One research-then-write branch per planned section"""
+    from langgraph.types import Send
+    
+    return [Send("section_pipeline", {"section": section}) for section in state.get('sections', [])]
 
-# Usage Example
-def run_enhanced_agent(topic: str, context: str = ""):
-    """Run the enhanced research agent"""
+def build_pipelined_workflow():
+    """Variant where each section researches and writes independently after planning"""
+    from langgraph.graph import StateGraph, START, END
+    
+    graph = StateGraph(State)
+    for name, node, anode in [
+        ("enhanced_orchestrator", enhanced_orchestrator, aenhanced_orchestrator),
+        ("research_coordinator", research_coordinator, None),
+        ("section_pipeline", section_pipeline, asection_pipeline),
+        ("quality_synthesizer", quality_synthesizer, aquality_synthesizer),
+    ]:
+        add_traced_node(graph, name, node, anode)
     
-    workflow = build_enhanced_workflow()
-    config = {"configurable": {"thread_id": f"research_{datetime.now().strftime('%Y%m%d_%H%M%S')}"}}
+    graph.add_edge(START, "enhanced_orchestrator")
+    graph.add_edge("enhanced_orchestrator", "research_coordinator")
+    graph.add_conditional_edges("research_coordinator", route_to_sections, ["section_pipeline"])
+    graph.add_edge("section_pipeline", "quality_synthesizer")
+    graph.add_edge("quality_synthesizer", END)
     
-    initial_state = {
+    return graph.compile(checkpointer=get_checkpointer())
+
+# Compiled graphs, built once per variant and shared by every request
+workflows = WorkflowRegistry()
+workflows.register("enhanced", build_enhanced_workflow)
+workflows.register("pipelined", build_pipelined_workflow)
+
+# Nodes whose LLM tokens are streamed to the caller
+WRITER_NODES = ("enhanced_section_writer", "section_pipeline")
+
+# Identical reports requested while one is running share that run. Streams
+# keep their own flights: a stream leader lands events, not a report.
+report_flights = SingleFlight()
+report_streams = SingleFlight()
+
+def get_workflow(variant: str = RESEARCH_WORKFLOW):
+    """Shared compiled workflow; isolate requests with their own thread_id"""
+    return workflows.get(variant)
+
+def forget_run(thread_id: str):
+    """Drop a run's in-memory research index and tool budget"""
+    from research_index import research_indexes
+    
+    research_indexes.drop(thread_id)
+    router = _instances.get("tool_router")
+    if router is not None:
+        router.release(thread_id)
+
+def release_thread(workflow, config):
+    """Drop a finished request's checkpoints, research index and tool budget"""
+    thread_id = config["configurable"]["thread_id"]
+    forget_run(thread_id)
+    try:
+        workflow.checkpointer.delete_thread(thread_id)
+    except Exception:
+        pass
+
+def configure_backends(llm=None, planner=None, tools=None, llm_scheduler=None, llm_cache=None,
+                       checkpointer=None, research_blobs=None, plan_stream=None, tool_router=None):
+    """Replace the shared backends, e.g. with fakes for offline benchmarks.
+    
+    `llm` is any chat model (used by the section writers), `planner` any
+    runnable returning Sections, `plan_stream` any runnable streaming the
+    plan as growing dicts (speculative research), `tools` a mapping of
+    tool name ("wikipedia", "web_search", "current_news") to a callable
+    taking the query, or a ResearchEngine over such a mapping (with
+    coroutine versions in its async_tools for arun_enhanced_agent), and
+    `tool_router` anything with route(query, thread_id), record(tool,
+    query, output, elapsed) and release(thread_id). Backends left as None
+    keep their current or default value.
+    """
+    with _instances_lock:
+        if llm is not None:
+            _instances["llm"] = llm
+            if planner is None:
+                _instances.pop("planner", None)  # rebuilt from the new llm
+            if plan_stream is None:
+                _instances.pop("plan_stream", None)
+        if planner is not None:
+            _instances["planner"] = planner
+        if plan_stream is not None:
+            _instances["plan_stream"] = plan_stream
+        if tools is not None:
+            _instances["research_engine"] = tools if isinstance(tools, ResearchEngine) else ResearchEngine(tools)
+            if tool_router is None:
+                _instances.pop("tool_router", None)  # rebuilt for the new tools
+        if tool_router is not None:
+            _instances["tool_router"] = tool_router
+        if llm_scheduler is not None:
+            _instances["llm_scheduler"] = llm_scheduler
+        if llm_cache is not None:
+            _instances["llm_cache"] = llm_cache
+        if research_blobs is not None:
+            _instances["research_blobs"] = research_blobs
+        if checkpointer is not None:
+            _instances["checkpointer"] = checkpointer
+            workflows.clear()  # recompile against the new checkpointer
+
+_LAZY_ATTRIBUTES = {
+    "llm": get_llm,
+    "planner": get_planner,
+    "plan_stream": get_plan_stream,
+    "tools": get_tools,
+    "tool_cache": get_tool_cache,
+    "llm_cache": get_llm_cache,
+    "llm_scheduler": get_llm_scheduler,
+    "checkpointer": get_checkpointer,
+    "research_blobs": get_research_blobs,
+    "research_engine": get_research_engine,
+    "tool_router": get_tool_router,
+    "workflow": get_workflow,
+}
+
+def __getattr__(name):
+    """Keep `agent.llm`, `agent.workflow`, ... working without building them at import"""
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Usage Example
+def make_initial_state(topic: str, context: str = ""):
+    """Empty graph state for a new report"""
+    return {
         "topic": topic,
         "user_context": context,
         "sections": [],
         "research_results": [],
         "completed_sections": [],
         "final_report": "",
-        "error_log": []
+        "error_log": [],
+        "run_summary": {}
     }
+
+def research_deadline() -> Optional[float]:
+    """When a run starting now must stop waiting for research (epoch seconds)"""
+    if REPORT_LATENCY_BUDGET <= 0:
+        return None
+    return time.time() + REPORT_LATENCY_BUDGET * RESEARCH_BUDGET_SHARE
+
+def make_run_config(use_cache: bool = True):
+    """Per-request config with its own thread_id"""
+    return {"configurable": {
+        "thread_id": f"research_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}",
+        "use_llm_cache": use_cache,
+        "research_deadline": research_deadline()
+    }}
+
+def run_enhanced_agent(topic: str, context: str = "", use_cache: bool = True, variant: str = RESEARCH_WORKFLOW):
+    """Run the enhanced research agent, sharing any identical run in flight"""
+    key = request_key(topic, context, use_cache=use_cache, variant=variant)
+    return report_flights.do(key, lambda: _run_report(topic, context, use_cache, variant))
+
+def _run_report(topic: str, context: str, use_cache: bool, variant: str):
+    workflow = get_workflow(variant)
+    config = make_run_config(use_cache)
+    return _invoke(workflow, make_initial_state(topic, context), config)
+
+def _invoke(workflow, graph_input, config):
+    """Invoke a run; failed runs keep their checkpoints for resume_enhanced_agent"""
+    try:
+        result = workflow.invoke(graph_input, config=config)
+    except Exception as e:
+        return _failed_run(config, e)
+    return _finished_run(workflow, config, result)
+
+async def arun_enhanced_agent(topic: str, context: str = "", use_cache: bool = True,
+                              variant: str = RESEARCH_WORKFLOW):
+    """Async run_enhanced_agent: concurrent reports share the event loop instead of a thread each.
     
+    Shares identical runs in flight with run_enhanced_agent callers too; a
+    failed run resumes with resume_enhanced_agent like any other.
+    """
+    key = request_key(topic, context, use_cache=use_cache, variant=variant)
+    return await report_flights.ado(key, lambda: _arun_report(topic, context, use_cache, variant))
+
+async def _arun_report(topic: str, context: str, use_cache: bool, variant: str):
+    workflow = get_workflow(variant)
+    config = make_run_config(use_cache)
     try:
-        result = workflow.invoke(initial_state, config=config)
-        
-        if result.get('error_log'):
-            print("Errors encountered:")
-            for error in result['error_log']:
-                print(f"- {error}")
-        
-        return result['final_report']
-        
+        result = await workflow.ainvoke(make_initial_state(topic, context), config=config)
     except Exception as e:
-        return f"Workflow execution error: {str(e)}"
+        return _failed_run(config, e)
+    return await asyncio.to_thread(_finished_run, workflow, config, result)
+
+def _failed_run(config, error: Exception) -> str:
+    thread_id = config["configurable"]["thread_id"]
+    forget_run(thread_id)
+    telemetry.finish(thread_id, error=str(error))
+    return f"Workflow execution error: {str(error)} (resume with resume_enhanced_agent({thread_id!r}))"
+
+def _finished_run(workflow, config, result) -> str:
+    if result.get('error_log'):
+        print("Errors encountered:")
+        for error in result['error_log']:
+            print(f"- {error}")
+    
+    telemetry.finish(config["configurable"]["thread_id"])
+    release_thread(workflow, config)
+    return result['final_report']
+
+def resume_enhanced_agent(thread_id: str, use_cache: bool = True, variant: str = RESEARCH_WORKFLOW):
+    """Finish a failed run from its last checkpoint.
+    
+    Nodes that completed, including research and any sections already
+    written, are not run again. Pass the variant the run was started with.
+    """
+    resumable = _resume_point(thread_id, use_cache, variant)
+    if resumable is None:
+        return f"Nothing to resume for thread {thread_id}"
+    workflow, config = resumable
+    return _invoke(workflow, None, config)
+
+def _resume_point(thread_id: str, use_cache: bool = True, variant: str = RESEARCH_WORKFLOW):
+    """(workflow, config) to continue a failed run with, or None if it has nothing left to run"""
+    from research_index import research_indexes
+    
+    workflow = get_workflow(variant)
+    config = {"configurable": {"thread_id": thread_id, "use_llm_cache": use_cache,
+                               "research_deadline": research_deadline()}}
+    snapshot = workflow.get_state(config)
+    if not snapshot.next:
+        return None
+    
+    # The research index lives in memory; rebuild it from the saved research
+    if research_indexes.get(thread_id) is None and snapshot.values.get('research_results'):
+        research_indexes.build(thread_id, resolve_research(snapshot.values['research_results']))
+    return workflow, config
+
+def stream_enhanced_agent(topic: str, context: str = "", use_cache: bool = True, variant: str = RESEARCH_WORKFLOW):
+    """Run the enhanced research agent, yielding progress events as they happen.
+    
+    Events are dicts with a "type" key:
+    - node: a graph node finished ({"node": name})
+    - token: a section writer produced text ({"task": writer id, "delta": text})
+    - section: a section finished ({"index": n, "markdown": text})
+    - error: a node logged an error ({"message": text}); a failed run also
+      carries the "thread_id" to pass to resume_enhanced_agent or
+      stream_resumed_agent
+    - report: the final report ({"markdown": text})
+    - summary: the run's telemetry summary, last ({"summary": dict})
+    
+    Identical requests streaming at the same time share one run and see
+    the same events.
+    """
+    key = request_key(topic, context, use_cache=use_cache, variant=variant)
+    yield from report_streams.stream(key, lambda: _stream_report(topic, context, use_cache, variant))
+
+def stream_resumed_agent(thread_id: str, use_cache: bool = True, variant: str = RESEARCH_WORKFLOW):
+    """resume_enhanced_agent, yielding the same events as stream_enhanced_agent"""
+    yield from report_streams.stream(("resume", thread_id, variant),
+                                     lambda: _stream_resume(thread_id, use_cache, variant))
+
+def _stream_resume(thread_id: str, use_cache: bool, variant: str):
+    resumable = _resume_point(thread_id, use_cache, variant)
+    if resumable is None:
+        yield {"type": "error", "message": f"Nothing to resume for thread {thread_id}"}
+        return
+    workflow, config = resumable
+    yield from _stream_run(workflow, None, config)
+
+def _stream_report(topic: str, context: str, use_cache: bool, variant: str):
+    yield from _stream_run(get_workflow(variant), make_initial_state(topic, context), make_run_config(use_cache))
+
+def _stream_run(workflow, graph_input, config):
+    """Events from one workflow run; `graph_input` None continues the config's thread"""
+    thread_id = config["configurable"]["thread_id"]
+    sections_done = 0
+    failed = False
+    summary = None
+    
+    try:
+        for mode, chunk in workflow.stream(graph_input, config=config, stream_mode=["updates", "messages"]):
+            if mode == "messages":
+                message, metadata = chunk
+                if metadata.get("langgraph_node") in WRITER_NODES and message.content:
+                    yield {"type": "token", "task": metadata.get("langgraph_checkpoint_ns", ""), "delta": message.content}
+                continue
+            
+            for node, update in chunk.items():
+                update = update or {}
+                for error in update.get("error_log", []):
+                    yield {"type": "error", "message": error}
+                for markdown in update.get("completed_sections", []):
+                    sections_done += 1
+                    yield {"type": "section", "index": sections_done, "markdown": markdown}
+                if update.get("final_report"):
+                    yield {"type": "report", "markdown": update["final_report"]}
+                yield {"type": "node", "node": node}
+    
+    except Exception as e:
+        failed = True
+        forget_run(thread_id)
+        summary = telemetry.finish(thread_id, error=str(e))
+        yield {"type": "error", "message": f"Workflow execution error: {str(e)}", "thread_id": thread_id}
+    finally:
+        if not failed:
+            summary = telemetry.finish(thread_id)
+            release_thread(workflow, config)
+    
+    if summary:
+        yield {"type": "summary", "summary": summary}
 
 # Example usage
 if __name__ == "__main__":
@@ -1,11 +1,12 @@
 import streamlit as st
-import time
 import re
 from datetime import datetime
 import os
 from io import BytesIO
 import base64
-from agent import run_enhanced_agent
+import uuid
+from circuit_breaker import tool_health
+from jobs import QueueFull, get_job_queue
 
 
 # Import your research agent (assuming it's in a separate file)
@@ -124,12 +125,111 @@ if 'current_report' not in st.session_state:
     st.session_state.current_report = None
 if 'research_count' not in st.session_state:
     st.session_state.research_count = 0
+if 'user_id' not in st.session_state:
+    st.session_state.user_id = uuid.uuid4().hex
+if 'active_job' not in st.session_state:
+    st.session_state.active_job = None
+if 'failed_run' not in st.session_state:
+    st.session_state.failed_run = None
 
 def create_download_link(content, filename):
     """Create a download link for the report"""
     b64 = base64.b64encode(content.encode()).decode()
     return f'<a href="data:text/markdown,{b64}" download="{filename}" style="text-decoration: none; color: #667eea; font-weight: 600;">📄 Download Report as Markdown</a>'
 
+def follow_job(active_job):
+    """Render a job's progress from its events until it finishes"""
+    queue = get_job_queue()
+    job = queue.get(active_job['id'])
+    if job is None:
+        st.session_state.active_job = None
+        st.warning("⚠️ The research job is no longer available.")
+        return
+    
+    # Progress indicator
+    st.markdown("""
+    <div class="progress-container">
+        <h3>🔄 Generating Research Report...</h3>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    
+    # Progress reported as graph nodes finish
+    node_stages = {
+        "enhanced_orchestrator": (20, "🌐 Gathering web information and recent news..."),
+        "research_join": (40, "✍️ Writing detailed sections..."),
+        "quality_synthesizer": (100, "📄 Finalizing report...")
+    }
+    
+    # Render sections as the writers stream them
+    live_sections = st.container()
+    drafts = {}  # writer task -> [placeholder, text so far]
+    cursor = 0
+    
+    while True:
+        if job.status == "queued":
+            position = queue.position(job.id)
+            status_text.text(f"⏳ Waiting for a research worker ({position or 0} report(s) ahead)...")
+        elif cursor == 0:
+            status_text.text("📋 Planning research structure...")
+        
+        # Blocks until new events arrive, so there is no busy polling
+        events, cursor = job.events_since(cursor, timeout=1.0)
+        for event in events:
+            if event["type"] == "node" and event["node"] in node_stages:
+                progress, status = node_stages[event["node"]]
+                progress_bar.progress(progress)
+                status_text.text(status)
+            elif event["type"] == "token":
+                if event["task"] not in drafts:
+                    drafts[event["task"]] = [live_sections.empty(), ""]
+                draft = drafts[event["task"]]
+                draft[1] += event["delta"]
+                draft[0].markdown(draft[1])
+            elif event["type"] == "section":
+                # Cached sections arrive whole, without tokens
+                if not any(text.strip() == event["markdown"].strip() for _, text in drafts.values()):
+                    drafts[f"section_{event['index']}"] = [live_sections.empty(), event["markdown"]]
+                    drafts[f"section_{event['index']}"][0].markdown(event["markdown"])
+                progress_bar.progress(min(90, 40 + 10 * event["index"]))
+                status_text.text(f"✍️ {event['index']} section(s) written...")
+        
+        if job.finished and cursor >= job.published:
+            break
+    
+    st.session_state.active_job = None
+    if job.status == "failed":
+        st.error(f"❌ Error generating report: {job.error}")
+        thread_id = job.resume_thread_id
+        if thread_id:
+            # Research and finished sections are checkpointed; resuming reruns only what failed
+            st.session_state.failed_run = {
+                'thread_id': thread_id,
+                'topic': active_job['topic'],
+                'context': active_job['context']
+            }
+        else:
+            st.info("💡 Please check your API keys and try again.")
+        return
+    
+    st.session_state.current_report = job.result
+    #st.session_state.research_count += 1
+    
+    # Add to history
+    st.session_state.research_history.append({
+        'topic': active_job['topic'],
+        'context': active_job['context'],
+        'report': job.result,
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M')
+    })
+    
+    progress_bar.progress(100)
+    status_text.text("✅ Research completed successfully!")
+    
+    st.rerun()
+
 def main():
     # Main Header
     st.markdown("""
@@ -168,6 +268,13 @@ def main():
         
         
         
+        # Worker pool load
+        metrics = get_job_queue().metrics()
+        st.caption(f"🧵 {metrics['running']}/{metrics['workers']} workers busy · {metrics['queue_depth']} report(s) queued")
+        unavailable = [tool for tool, health in tool_health.snapshot().items() if health["state"] != "closed"]
+        if unavailable:
+            st.caption(f"⚠️ Research tools unavailable, reports skip them: {', '.join(unavailable)}")
+        
         # Research History
         if st.session_state.research_history:
             st.markdown("### 📈 Recent Research")
@@ -250,65 +357,43 @@ def main():
                     if 'example_context' in st.session_state:
                         del st.session_state.example_context
                     
-                    # Progress indicator
-                    st.markdown("""
-                    <div class="progress-container">
-                        <h3>🔄 Generating Research Report...</h3>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-                    
-                    # Simulate progress with status updates
-                    stages = [
-                        (20, "📋 Planning research structure..."),
-                        (40, "🌐 Gathering web information..."),
-                        (60, "📰 Collecting recent news..."),
-                        (80, "✍️ Writing detailed sections..."),
-                        (100, "📄 Finalizing report...")
-                    ]
-                    
-                    for progress, status in stages:
-                        progress_bar.progress(progress)
-                        status_text.text(status)
-                        time.sleep(0.5)
-                    
+                    # Queue the report; the shared worker pool runs it
                     try:
-                        # Generate the report
-                        with st.spinner("🤖 AI agents are researching..."):
-                            report = run_enhanced_agent(research_topic, final_context)
-                        
-                        st.session_state.current_report = report
-                        #st.session_state.research_count += 1
-                        
-                        # Add to history
-                        st.session_state.research_history.append({
+                        job_id = get_job_queue().submit(st.session_state.user_id, research_topic, final_context)
+                        st.session_state.active_job = {
+                            'id': job_id,
                             'topic': research_topic,
-                            'context': final_context,
-                            'report': report,
-                            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M')
-                        })
-                        
-                        progress_bar.progress(100)
-                        status_text.text("✅ Research completed successfully!")
-                        
-                        st.markdown("""
-                        <div class="success-message">
-                            <strong>🎉 Research Report Generated Successfully!</strong><br>
-                            Your comprehensive research report is ready. Scroll down to view the results.
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                        time.sleep(1)
-                        st.rerun()
-                        
-                    except Exception as e:
-                        st.error(f"❌ Error generating report: {str(e)}")
-                        st.info("💡 Please check your API keys and try again.")
+                            'context': final_context
+                        }
+                        st.session_state.failed_run = None
+                    except QueueFull as e:
+                        st.warning(f"⏳ {e}. Please try again shortly.")
                 else:
                     st.warning("⚠️ Please enter a research topic to continue.")
     
+    # Follow the queued or running job, if any
+    if st.session_state.active_job:
+        follow_job(st.session_state.active_job)
+    
+    # Offer to finish a failed report from its checkpoint
+    failed_run = st.session_state.failed_run
+    if failed_run and not st.session_state.active_job:
+        st.info(f"💡 The research and finished sections for \"{failed_run['topic']}\" were saved. "
+                "Resume to retry only what failed, or check your API keys first.")
+        if st.button("🔁 Resume Report", type="primary"):
+            try:
+                job_id = get_job_queue().submit(st.session_state.user_id, failed_run['topic'], failed_run['context'],
+                                                options={'resume': failed_run['thread_id']})
+                st.session_state.active_job = {
+                    'id': job_id,
+                    'topic': failed_run['topic'],
+                    'context': failed_run['context']
+                }
+                st.session_state.failed_run = None
+                st.rerun()
+            except QueueFull as e:
+                st.warning(f"⏳ {e}. Please try again shortly.")
+    
     # Display Current Report
     if st.session_state.current_report:
         st.markdown("---")
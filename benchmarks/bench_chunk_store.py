@@ -0,0 +1,111 @@
+"""ChunkStore vs a list of pydantic results at 10k chunks.
+
+Compares per-chunk embedding calls and a Python cosine loop over a list of
+objects against the store's batched embedding and vectorized scoring, and
+reports the memory each representation holds.
+
+Usage: python benchmarks/bench_chunk_store.py [--chunks 10000] [--queries 50]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from pydantic import BaseModel
+
+from chunk_store import ChunkStore
+from embeddings import HashingEmbedder
+
+WORDS = ("retrieval augmented generation vector index embedding latency throughput token budget "
+         "model graph search news encyclopedia python asyncio cache section planner writer "
+         "benchmark memory cosine similarity batch matrix chunk source query priority").split()
+
+
+class ResearchResult(BaseModel):
+    query: str
+    content: str
+    source: str
+    relevance_score: float
+
+
+def make_chunks(count: int, rng: random.Random):
+    return [(f"query {i % 200}", " ".join(rng.choice(WORDS) for _ in range(60)) + ".") for i in range(count)]
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def retained_memory(func):
+    """Bytes still allocated by what func() returns"""
+    tracemalloc.start()
+    result = func()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    chunks = make_chunks(args.chunks, rng)
+    probes = [" ".join(rng.choice(WORDS) for _ in range(8)) for _ in range(args.queries)]
+    embed = HashingEmbedder()
+
+    # Baseline: one pydantic object and one embed call per chunk
+    def build_list():
+        results = [ResearchResult(query=q, content=t, source="Web", relevance_score=0.5) for q, t in chunks]
+        vectors = [embed([r.content])[0] for r in results]
+        return results, vectors
+
+    (results, vectors), list_build = timed(build_list)
+    list_memory = retained_memory(build_list)
+
+    def score_list():
+        for probe in probes:
+            q = embed([probe])[0]
+            scores = [float(np.dot(v, q)) for v in vectors]
+            sorted(range(len(scores)), key=scores.__getitem__, reverse=True)[:12]
+
+    _, list_score = timed(score_list)
+
+    # ChunkStore: one text buffer, batched embedding, one contiguous matrix
+    def build_store():
+        store = ChunkStore(embed)
+        for q, t in chunks:
+            store.add(q, t, 0.5, "Web")
+        store.embeddings
+        return store
+
+    store, store_build = timed(build_store)
+    store_memory = retained_memory(build_store)
+
+    def score_store():
+        for probe in probes:
+            store.top_k(probe, 12)
+
+    _, store_score = timed(score_store)
+
+    print(f"{args.chunks} chunks, {args.queries} top-12 queries")
+    print(f"{'':24}{'build+embed':>14}{'per query':>14}{'retained':>14}")
+    print(f"{'list of ResearchResult':24}{list_build:>13.2f}s{list_score / args.queries * 1e3:>12.2f}ms"
+          f"{list_memory / 2**20:>12.1f}MB")
+    print(f"{'ChunkStore':24}{store_build:>13.2f}s{store_score / args.queries * 1e3:>12.2f}ms"
+          f"{store_memory / 2**20:>12.1f}MB")
+    print(f"scoring speedup: {list_score / store_score:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
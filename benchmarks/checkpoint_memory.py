@@ -0,0 +1,164 @@
+"""Checkpoint bytes and peak RSS per report: inline research vs blob refs.
+
+Runs a graph with the enhanced workflow's shape (planner -> sharded
+research -> join -> one writer per section -> synthesizer) on the SQLite
+checkpointer, with synthetic research text and no network or model calls.
+
+- inline: research text lives in State and every writer's Send payload
+  carries the full research list, as the workflow did before.
+- refs: State carries ResearchRefs and the text is stored once in the
+  blob store, as the workflow does now.
+
+Each mode runs in its own subprocess so peak RSS is not shared.
+
+Usage: python benchmarks/checkpoint_memory.py [--reports 20] [--sections 6] [--queries 3] [--shards 4]
+"""
+import argparse
+import json
+import operator
+import os
+import random
+import resource
+import subprocess
+import sys
+from typing import Annotated, List, TypedDict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORDS = ("retrieval augmented generation vector index embedding latency throughput token budget "
+         "model graph search news encyclopedia python asyncio cache section planner writer "
+         "benchmark memory cosine similarity batch matrix chunk source query priority").split()
+
+
+def research_text(rng: random.Random, words: int) -> str:
+    """Three labelled sources, roughly what research_worker stores per query"""
+    return "\n\n".join(
+        f"{label}: " + " ".join(rng.choice(WORDS) for _ in range(words))
+        for label in ("Wikipedia", "Web", "News")
+    )
+
+
+def build_graph(mode: str, checkpointer, blobs, args):
+    from langgraph.graph import END, START, StateGraph
+    from langgraph.types import Send
+
+    from agent import ResearchRef, ResearchResult
+
+    class State(TypedDict):
+        topic: str
+        sections: List[str]
+        research_results: Annotated[list, operator.add]
+        completed_sections: Annotated[list, operator.add]
+        final_report: str
+
+    def planner(state):
+        return {"sections": [f"{state['topic']} section {i}" for i in range(args.sections)]}
+
+    def route_research(state):
+        queries = [f"{name} query {j}" for name in state["sections"] for j in range(args.queries)]
+        return [Send("research", {"queries": queries[i::args.shards], "topic": state["topic"]})
+                for i in range(args.shards)]
+
+    def research(state):
+        rng = random.Random(state["topic"])
+        results = []
+        for query in state["queries"]:
+            text = research_text(rng, args.words)
+            if mode == "inline":
+                results.append(ResearchResult(query=query, content=text, source="Wikipedia, Web, News",
+                                              relevance_score=0.8))
+            else:
+                results.append(ResearchRef(query=query, content_ref=blobs.put(text),
+                                           source="Wikipedia, Web, News", relevance_score=0.8))
+        return {"research_results": results}
+
+    def join(state):
+        return {}
+
+    def route_writers(state):
+        if mode == "inline":
+            return [Send("writer", {"section": s, "research_results": state["research_results"]})
+                    for s in state["sections"]]
+        return [Send("writer", {"section": s}) for s in state["sections"]]
+
+    def writer(state):
+        return {"completed_sections": [f"## {state['section']}\n" + "body " * 300]}
+
+    def synthesizer(state):
+        return {"final_report": "\n\n".join(state["completed_sections"])}
+
+    graph = StateGraph(State)
+    for name, node in [("planner", planner), ("research", research), ("join", join),
+                       ("writer", writer), ("synthesizer", synthesizer)]:
+        graph.add_node(name, node)
+    graph.add_edge(START, "planner")
+    graph.add_conditional_edges("planner", route_research, ["research"])
+    graph.add_edge("research", "join")
+    graph.add_conditional_edges("join", route_writers, ["writer"])
+    graph.add_edge("writer", "synthesizer")
+    graph.add_edge("synthesizer", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def table_bytes(conn, table: str, columns: str) -> int:
+    return conn.execute(f"SELECT COALESCE(SUM({columns}), 0) FROM {table}").fetchone()[0]
+
+
+def run_mode(mode: str, args) -> dict:
+    from blob_store import BlobStore
+    from checkpointer import SqliteCheckpointer
+
+    checkpointer = SqliteCheckpointer(":memory:", prune_every=0)
+    blobs = BlobStore(":memory:", prune_every=0)
+    workflow = build_graph(mode, checkpointer, blobs, args)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    for i in range(args.reports):
+        workflow.invoke({"topic": f"topic {i}"}, {"configurable": {"thread_id": f"report-{i}"}})
+
+    conn = checkpointer._conn
+    checkpoint_bytes = (table_bytes(conn, "checkpoints", "LENGTH(checkpoint) + LENGTH(metadata)")
+                        + table_bytes(conn, "blobs", "LENGTH(data)")
+                        + table_bytes(conn, "writes", "LENGTH(data)"))
+    blob_bytes = blobs.stats()["stored_bytes"]
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "mode": mode,
+        "checkpoint_bytes_per_report": checkpoint_bytes / args.reports,
+        "blob_store_bytes_per_report": blob_bytes / args.reports,
+        "peak_rss_mb": peak / 1024,  # ru_maxrss is in KiB on Linux
+        "rss_growth_mb": (peak - baseline) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=20)
+    parser.add_argument("--sections", type=int, default=6)
+    parser.add_argument("--queries", type=int, default=3, help="research queries per section")
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--words", type=int, default=900, help="words per source per query")
+    parser.add_argument("--mode", choices=["inline", "refs"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args)))
+        return
+
+    rows = []
+    for mode in ("inline", "refs"):
+        out = subprocess.run([sys.executable, __file__, "--mode", mode] + sys.argv[1:],
+                             check=True, capture_output=True, text=True).stdout
+        rows.append(json.loads(out.strip().splitlines()[-1]))
+
+    print(f"{args.reports} reports, {args.sections} sections x {args.queries} queries, {args.shards} shards")
+    print(f"{'':8}{'checkpoints/report':>20}{'blobs/report':>15}{'total/report':>15}{'peak RSS':>12}{'growth':>10}")
+    for row in rows:
+        total = row["checkpoint_bytes_per_report"] + row["blob_store_bytes_per_report"]
+        print(f"{row['mode']:8}{row['checkpoint_bytes_per_report'] / 1024:>18.1f}KB"
+              f"{row['blob_store_bytes_per_report'] / 1024:>13.1f}KB{total / 1024:>13.1f}KB"
+              f"{row['peak_rss_mb']:>10.1f}MB{row['rss_growth_mb']:>8.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Thread-per-report vs async reports at many simultaneous reports.
+
+Runs benchmarks/e2e.py once per mode in its own process: --mode threads
+(run_enhanced_agent on a thread per report) and --mode async
+(arun_enhanced_agent, every report a task on one event loop). Both use
+the same fake backends and limits and start every report at once.
+Prints latency, throughput, peak threads, memory and CPU side by side.
+
+Limits default high enough that the backends, not the client-side caps,
+bound both modes; other arguments are passed through to e2e.py.
+
+Usage: python benchmarks/concurrency.py [--reports 50] [--output concurrency.json] [e2e.py options]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Shared by both modes; e2e.py options given on the command line come later and win
+DEFAULT_E2E_ARGS = ["--research-concurrency", "64", "--tool-limits", "web_search=32,wikipedia=32,current_news=16",
+                    "--llm-concurrency", "64"]
+
+
+def run_mode(mode: str, reports: int, extra):
+    with tempfile.TemporaryDirectory(prefix="concurrency-bench-") as scratch:
+        output = os.path.join(scratch, f"{mode}.json")
+        command = [sys.executable, os.path.join(HERE, "e2e.py"), "--mode", mode, "--topics", str(reports),
+                   "--concurrency", str(reports), "--output", output] + DEFAULT_E2E_ARGS + list(extra)
+        # Each mode gets fresh caches and checkpoints
+        env = {**os.environ, **{name: os.path.join(scratch, file) for name, file in [
+            ("TOOL_CACHE_PATH", "tools.sqlite"), ("LLM_CACHE_PATH", "llm.sqlite"),
+            ("CHECKPOINT_PATH", "checkpoints.sqlite"), ("BLOB_STORE_PATH", "blobs.sqlite")]}}
+        subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+        with open(output) as f:
+            return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=50, help="reports started at once")
+    parser.add_argument("--output", help="write both modes' results as JSON to this path")
+    args, extra = parser.parse_known_args()
+
+    results = {mode: run_mode(mode, args.reports, extra) for mode in ("threads", "async")}
+
+    rows = [
+        ("wall seconds", lambda r: f"{r['wall_seconds']:.1f}"),
+        ("reports/min", lambda r: f"{r['throughput_reports_per_min']:.1f}"),
+        ("latency p50 s", lambda r: f"{r['latency_seconds']['p50']:.2f}"),
+        ("latency p95 s", lambda r: f"{r['latency_seconds']['p95']:.2f}"),
+        ("latency max s", lambda r: f"{r['latency_seconds']['max']:.2f}"),
+        ("failures", lambda r: str(r["failures"])),
+        ("peak threads", lambda r: str(r["peak_threads"])),
+        ("peak RSS MB", lambda r: f"{r['peak_rss_mb']:.1f}"),
+        ("CPU seconds", lambda r: f"{r['cpu_seconds']:.1f}"),
+    ]
+    print(f"{args.reports} simultaneous reports")
+    print(f"{'':<16}{'threads':>12}{'async':>12}")
+    for label, cell in rows:
+        print(f"{label:<16}{cell(results['threads']):>12}{cell(results['async']):>12}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""End-to-end workflow benchmark on fake backends.
+
+Runs a workflow variant (enhanced or pipelined) for N topics at M concurrency with deterministic
+fake planner, writer model and tools (see benchmarks/fakes.py), then
+reports report latency percentiles, throughput, failures and peak memory.
+Results are written as JSON so runs can be compared between commits.
+
+Latencies are "median_ms" or "median_ms:sigma" (lognormal).
+
+Usage: python benchmarks/e2e.py [--topics 20] [--concurrency 4] [--variant pipelined] [--output e2e.json]
+       python benchmarks/e2e.py --speculative  # research while the plan streams
+       python benchmarks/e2e.py --kind-misses  # tools that rarely help some kinds of query
+       python benchmarks/e2e.py --tool-latency 300:1.2 --latency-budget 20 --hedge-percentile 90
+       python benchmarks/e2e.py --outage web_search:0:60 [--no-breakers]  # backend down for the first 60s
+       python benchmarks/e2e.py --mode async --topics 50 --concurrency 50  # one event loop, no thread per report
+       python benchmarks/e2e.py --tool-latency 400:0.5 --tool-failure-rate 0.05 --llm-failure-rate 0.02
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Keep benchmark runs away from the real caches
+_scratch = tempfile.mkdtemp(prefix="e2e-bench-")
+for name, file in [("TOOL_CACHE_PATH", "tools.sqlite"), ("LLM_CACHE_PATH", "llm.sqlite"),
+                   ("CHECKPOINT_PATH", "checkpoints.sqlite"), ("BLOB_STORE_PATH", "blobs.sqlite")]:
+    os.environ.setdefault(name, os.path.join(_scratch, file))
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+import agent
+from fakes import FakeChatModel, FakePlanner, FakeTool, Latency
+from llm_scheduler import AdaptiveConcurrency, LLMScheduler
+from circuit_breaker import HealthRegistry
+from research_engine import ResearchEngine, parse_tool_limits
+
+
+def percentile(values, q: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+# With --kind-misses: share of each query kind a tool answers with nothing
+KIND_MISS_RATES = {
+    "wikipedia": {"news": 0.85, "general": 0.3},
+    "web_search": {"news": 0.05, "reference": 0.1, "general": 0.05},
+    "current_news": {"reference": 0.95, "general": 0.9, "news": 0.1},
+}
+
+
+def parse_outage(spec):
+    """"tool:start:end" in seconds from startup"""
+    if not spec:
+        return None, None
+    tool, start, end = spec.split(":")
+    return tool, (float(start), float(end))
+
+
+def install_fakes(args):
+    planner = FakePlanner(sections=args.sections, queries=args.queries, latency=Latency.parse(args.planner_latency),
+                          failure_rate=args.llm_failure_rate, seed=args.seed)
+    outage_tool, outage = parse_outage(args.outage)
+    tools = {name: FakeTool(name, latency=Latency.parse(args.tool_latency), failure_rate=args.tool_failure_rate,
+                            words=args.tool_words, seed=args.seed,
+                            miss_rates=KIND_MISS_RATES[name] if args.kind_misses else None,
+                            outage=outage if name == outage_tool else None)
+             for name in ("wikipedia", "web_search", "current_news")}
+    # A breaker that never trips stands in for no breakers at all
+    health = HealthRegistry(min_calls=10 ** 9) if args.no_breakers else None
+    agent.configure_backends(
+        llm=FakeChatModel(ttft=Latency.parse(args.llm_ttft), tokens_per_second=args.llm_tokens_per_sec,
+                          completion_tokens=args.llm_completion_tokens,
+                          failure_rate=args.llm_failure_rate, seed=args.seed),
+        planner=planner,
+        plan_stream=planner,
+        tools=ResearchEngine(tools, max_concurrency=args.research_concurrency,
+                             tool_limits=parse_tool_limits(args.tool_limits) if args.tool_limits else None,
+                             hedge_percentile=args.hedge_percentile, health=health,
+                             async_tools={name: tool.acall for name, tool in tools.items()}),
+        llm_scheduler=LLMScheduler(rpm=args.rpm, tpm=args.tpm, backoff_base=0.05, backoff_cap=1.0,
+                                   concurrency=AdaptiveConcurrency(initial=args.llm_concurrency,
+                                                                   maximum=args.llm_concurrency)
+                                   if args.llm_concurrency else None),
+    )
+
+
+def outcome(report, start: float):
+    failed = not report or report.startswith("Workflow execution error")
+    return time.perf_counter() - start, failed
+
+
+def run_one(topic: str, variant: str):
+    start = time.perf_counter()
+    return outcome(agent.run_enhanced_agent(topic, "benchmark run", use_cache=False, variant=variant), start)
+
+
+def run_threads(topics, args):
+    """Thread-per-report: run_enhanced_agent on a pool of `concurrency` threads"""
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        return list(pool.map(lambda topic: run_one(topic, args.variant), topics))
+
+
+async def run_async(topics, args):
+    """Every report a task on one event loop, at most `concurrency` at a time"""
+    limit = asyncio.Semaphore(args.concurrency)
+
+    async def one(topic):
+        async with limit:
+            start = time.perf_counter()
+            report = await agent.arun_enhanced_agent(topic, "benchmark run", use_cache=False, variant=args.variant)
+            return outcome(report, start)
+
+    return await asyncio.gather(*(one(topic) for topic in topics))
+
+
+class ThreadSampler:
+    """Peak number of live threads, sampled in the background"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--topics", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--variant", default="enhanced", choices=["enhanced", "pipelined"])
+    parser.add_argument("--mode", default="threads", choices=["threads", "async"],
+                        help="a thread per report (run_enhanced_agent) or one event loop (arun_enhanced_agent)")
+    parser.add_argument("--speculative", action="store_true", help="start research while the plan streams")
+    parser.add_argument("--sections", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=3, help="research queries per section")
+    parser.add_argument("--planner-latency", default="800:0.3")
+    parser.add_argument("--llm-ttft", default="300:0.3", help="writer time to first token")
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=400.0)
+    parser.add_argument("--llm-completion-tokens", type=int, default=600)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--tool-latency", default="400:0.5")
+    parser.add_argument("--tool-failure-rate", type=float, default=0.0)
+    parser.add_argument("--tool-words", type=int, default=400)
+    parser.add_argument("--kind-misses", action="store_true", help="tools miss on query kinds they are bad at")
+    parser.add_argument("--latency-budget", type=float, default=agent.REPORT_LATENCY_BUDGET,
+                        help="per-report latency budget in seconds (0 = none)")
+    parser.add_argument("--hedge-percentile", type=float, default=95.0, help="0 disables hedged tool calls")
+    parser.add_argument("--outage", help="tool:start:end - the tool hangs and fails between these seconds")
+    parser.add_argument("--no-breakers", action="store_true", help="keep calling failing tools")
+    parser.add_argument("--research-concurrency", type=int, default=8, help="research thread pool size")
+    parser.add_argument("--tool-limits", help='calls in flight per tool, e.g. "web_search=4,wikipedia=4"')
+    parser.add_argument("--llm-concurrency", type=int, default=0,
+                        help="fixed LLM calls in flight (0 = the scheduler's adaptive default)")
+    parser.add_argument("--rpm", type=float, default=0, help="client-side request budget (0 = unlimited)")
+    parser.add_argument("--tpm", type=float, default=0, help="client-side token budget (0 = unlimited)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    install_fakes(args)
+    agent.SPECULATIVE_RESEARCH = args.speculative
+    agent.REPORT_LATENCY_BUDGET = args.latency_budget
+    agent.get_workflow(args.variant)  # compile outside the timed region
+    topics = [f"Benchmark topic {i}" for i in range(args.topics)]
+
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    with ThreadSampler() as threads:
+        if args.mode == "async":
+            outcomes = asyncio.run(run_async(topics, args))
+        else:
+            outcomes = run_threads(topics, args)
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+
+    latencies = [elapsed for elapsed, _ in outcomes]
+    failures = sum(failed for _, failed in outcomes)
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "reports": len(outcomes),
+        "failures": failures,
+        "failure_rate": failures / len(outcomes) if outcomes else 0.0,
+        "wall_seconds": wall,
+        "throughput_reports_per_min": len(outcomes) / wall * 60 if wall else 0.0,
+        "latency_seconds": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+            "max": max(latencies, default=0.0),
+        },
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,  # KiB on Linux
+        "peak_threads": threads.peak,
+        "cpu_seconds": cpu,
+        "llm_scheduler": dict(agent.get_llm_scheduler().stats),
+        "research_single_flight": dict(agent.get_research_engine().flights.stats),
+        "tool_router": agent.get_tool_router().stats(),
+        "research_engine": dict(agent.get_research_engine().stats),
+        "tool_calls": {name: tool.calls for name, tool in agent.get_research_engine().tools.items()},
+        "tool_health": agent.get_research_engine().health.snapshot(),
+    }
+
+    lat = results["latency_seconds"]
+    print(f"{results['reports']} {args.variant} reports ({args.mode}) at concurrency {args.concurrency} in {wall:.1f}s "
+          f"({results['throughput_reports_per_min']:.1f} reports/min)")
+    print(f"latency p50 {lat['p50']:.2f}s  p95 {lat['p95']:.2f}s  p99 {lat['p99']:.2f}s  max {lat['max']:.2f}s")
+    print(f"failures {failures} ({results['failure_rate']:.1%})  peak RSS {results['peak_rss_mb']:.1f}MB  "
+          f"peak threads {threads.peak}  CPU {cpu:.1f}s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
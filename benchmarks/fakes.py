@@ -0,0 +1,293 @@
+"""Deterministic fake backends for offline benchmarks.
+
+Fake chat models, planner and tools return content derived from their
+input, with latency drawn from seeded distributions, a configurable
+token rate and injected failures. Install them with
+agent.configure_backends(...). Each also has an async side that sleeps
+on the event loop, for arun_enhanced_agent.
+"""
+import asyncio
+import hashlib
+import math
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+WORDS = ("retrieval augmented generation vector index embedding latency throughput token budget "
+         "model graph search news encyclopedia python asyncio cache section planner writer "
+         "benchmark memory cosine similarity batch matrix chunk source query priority").split()
+
+
+class Latency:
+    """Lognormal latency around a median; sigma=0 gives a constant delay.
+
+    Parsed from "median_ms" or "median_ms:sigma", e.g. "300:0.5".
+    """
+
+    def __init__(self, median_ms: float = 0.0, sigma: float = 0.0):
+        self.median = median_ms / 1000.0
+        self.sigma = sigma
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        median, _, sigma = spec.partition(":")
+        return cls(float(median), float(sigma or 0))
+
+    def sample(self, rng: random.Random) -> float:
+        if self.median <= 0:
+            return 0.0
+        return self.median * math.exp(self.sigma * rng.gauss(0, 1))
+
+    def __repr__(self):
+        return f"{self.median * 1000:g}:{self.sigma:g}"
+
+
+class FakeAPIError(Exception):
+    """Injected provider failure; looks like an HTTP error to the LLM scheduler"""
+
+    def __init__(self, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(f"fake API error {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class _Draws:
+    """Thread-safe seeded random draws shared by one fake backend"""
+
+    def __init__(self, seed: int):
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def latency(self, latency: Latency) -> float:
+        with self._lock:
+            return latency.sample(self._rng)
+
+    def fails(self, rate: float) -> bool:
+        with self._lock:
+            return self._rng.random() < rate
+
+
+def stable_words(text: str, count: int) -> List[str]:
+    """The same text always yields the same words"""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    return [rng.choice(WORDS) for _ in range(count)]
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that writes `completion_tokens` words at `tokens_per_second`.
+
+    Time to first token is drawn from `ttft`. A `failure_rate` share of calls
+    raises FakeAPIError (429 for `rate_limit_share` of them, else 503).
+    """
+
+    ttft: Any = Latency(300, 0.3)
+    tokens_per_second: float = 400.0
+    completion_tokens: int = 600
+    failure_rate: float = 0.0
+    rate_limit_share: float = 0.5
+    seed: int = 0
+    draws: Any = None
+
+    def model_post_init(self, context):
+        self.draws = _Draws(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark-chat"
+
+    def _begin(self, messages: List[BaseMessage]):
+        """Wait for the first token (or fail), then return the deterministic completion"""
+        time.sleep(self.draws.latency(self.ttft))
+        return self._completion(messages)
+
+    async def _abegin(self, messages: List[BaseMessage]):
+        await asyncio.sleep(self.draws.latency(self.ttft))
+        return self._completion(messages)
+
+    def _completion(self, messages: List[BaseMessage]):
+        if self.draws.fails(self.failure_rate):
+            raise FakeAPIError(429 if self.draws.fails(self.rate_limit_share) else 503, retry_after=0.0)
+        prompt = "\n".join(str(m.content) for m in messages)
+        heading = str(messages[-1].content).splitlines()[0] if messages else "Section"
+        words = stable_words(prompt, self.completion_tokens)
+        return prompt, [f"## {heading}\n"] + [word + " " for word in words]
+
+    def _usage(self, prompt: str, pieces: List[str]):
+        input_tokens = len(prompt.split())
+        return {"input_tokens": input_tokens, "output_tokens": len(pieces),
+                "total_tokens": input_tokens + len(pieces)}
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        prompt, pieces = self._begin(messages)
+        if self.tokens_per_second > 0:
+            time.sleep(len(pieces) / self.tokens_per_second)
+        message = AIMessage(content="".join(pieces), usage_metadata=self._usage(prompt, pieces))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        prompt, pieces = self._begin(messages)
+        for i, piece in enumerate(pieces):
+            if self.tokens_per_second > 0:
+                time.sleep(1 / self.tokens_per_second)
+            usage = self._usage(prompt, pieces) if i == len(pieces) - 1 else None
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece, usage_metadata=usage))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        prompt, pieces = await self._abegin(messages)
+        if self.tokens_per_second > 0:
+            await asyncio.sleep(len(pieces) / self.tokens_per_second)
+        message = AIMessage(content="".join(pieces), usage_metadata=self._usage(prompt, pieces))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages: List[BaseMessage], stop=None, run_manager=None,
+                       **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        prompt, pieces = await self._abegin(messages)
+        for i, piece in enumerate(pieces):
+            if self.tokens_per_second > 0:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            usage = self._usage(prompt, pieces) if i == len(pieces) - 1 else None
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece, usage_metadata=usage))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+
+class FakePlanner:
+    """Stands in for the structured-output planner: a fixed outline per topic.
+
+    invoke() returns Sections after the whole latency; stream() yields the
+    plan as growing dicts, one more query at a time, spread over it.
+    ainvoke() and astream() do the same on the event loop.
+    """
+
+    def __init__(self, sections: int = 5, queries: int = 3, latency: Optional[Latency] = None,
+                 failure_rate: float = 0.0, seed: int = 0):
+        self.sections = sections
+        self.queries = queries
+        self.latency = latency or Latency(800, 0.3)
+        self.failure_rate = failure_rate
+        self.draws = _Draws(seed)
+
+    def _plan(self, messages) -> dict:
+        topic = str(messages[-1].content).splitlines()[0]
+        return {"sections": [
+            {
+                "name": f"Part {i + 1}: {' '.join(stable_words(f'{topic} {i}', 3))}",
+                "description": f"{topic}: {' '.join(stable_words(f'{topic} {i} description', 12))}",
+                "section_type": "technical" if i % 2 else "overview",
+                "research_queries": [
+                    {"query": f"{topic} {' '.join(stable_words(f'{topic} {i} {j}', 4))}" + (" latest" if j == 0 else ""),
+                     "priority": 5 - j}
+                    for j in range(self.queries)
+                ],
+            }
+            for i in range(self.sections)
+        ]}
+
+    def invoke(self, messages, *args, **kwargs):
+        time.sleep(self.draws.latency(self.latency))
+        return self._result(messages)
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        await asyncio.sleep(self.draws.latency(self.latency))
+        return self._result(messages)
+
+    def _result(self, messages):
+        from agent import Sections
+
+        if self.draws.fails(self.failure_rate):
+            raise FakeAPIError(503)
+        return Sections.model_validate(self._plan(messages))
+
+    def stream(self, messages, *args, **kwargs) -> Iterator[dict]:
+        for delay, partial in self._steps(messages):
+            time.sleep(delay)
+            if partial is None:
+                raise FakeAPIError(503)
+            yield partial
+
+    async def astream(self, messages, *args, **kwargs) -> AsyncIterator[dict]:
+        for delay, partial in self._steps(messages):
+            await asyncio.sleep(delay)
+            if partial is None:
+                raise FakeAPIError(503)
+            yield partial
+
+    def _steps(self, messages) -> Iterator[tuple]:
+        """(delay, partial plan) pairs; a None plan means fail after the delay"""
+        plan = self._plan(messages)
+        steps = max(1, self.sections * self.queries)
+        delay = self.draws.latency(self.latency) / steps
+        if self.draws.fails(self.failure_rate):
+            yield delay * steps / 2, None
+            return
+        partial = {"sections": []}
+        for section in plan["sections"]:
+            partial["sections"].append({**section, "research_queries": []})
+            for query in section["research_queries"]:
+                partial["sections"][-1]["research_queries"].append(query)
+                yield delay, partial
+        if not plan["sections"]:
+            yield delay, partial
+
+
+class FakeTool:
+    """Search tool returning `words` deterministic words per query.
+
+    `miss_rates` maps a query kind (see tool_router.query_kind) to the
+    share of those queries answered with an empty "No results" page.
+    During `outage` (start, end seconds after construction) every call
+    hangs for `outage_timeout` and then fails, like a backend that is down.
+    Call it directly, or await acall() from a coroutine.
+    """
+
+    def __init__(self, name: str, latency: Optional[Latency] = None, failure_rate: float = 0.0,
+                 words: int = 400, seed: int = 0, miss_rates: Optional[Dict[str, float]] = None,
+                 outage: Optional[Tuple[float, float]] = None, outage_timeout: float = 2.0):
+        self.name = name
+        self.latency = latency or Latency(400, 0.5)
+        self.failure_rate = failure_rate
+        self.words = words
+        self.miss_rates = miss_rates or {}
+        self.outage = outage
+        self.outage_timeout = outage_timeout
+        self.calls = 0
+        self._created = time.monotonic()
+        self.draws = _Draws(int.from_bytes(hashlib.sha256(f"{name}:{seed}".encode()).digest()[:4], "big"))
+
+    def __call__(self, query: str) -> str:
+        self.calls += 1
+        if self._down():
+            time.sleep(self.outage_timeout)
+            raise TimeoutError(f"{self.name} timed out")
+        time.sleep(self.draws.latency(self.latency))
+        return self._answer(query)
+
+    async def acall(self, query: str) -> str:
+        self.calls += 1
+        if self._down():
+            await asyncio.sleep(self.outage_timeout)
+            raise TimeoutError(f"{self.name} timed out")
+        await asyncio.sleep(self.draws.latency(self.latency))
+        return self._answer(query)
+
+    def _down(self) -> bool:
+        return bool(self.outage) and self.outage[0] <= time.monotonic() - self._created < self.outage[1]
+
+    def _answer(self, query: str) -> str:
+        if self.draws.fails(self.failure_rate):
+            raise RuntimeError(f"{self.name} unavailable")
+        if self.miss_rates:
+            from tool_router import query_kind
+
+            if self.draws.fails(self.miss_rates.get(query_kind(query), 0.0)):
+                return f"No results found for '{query}'"
+        return f"{self.name} results for {query}: " + " ".join(stable_words(f"{self.name} {query}", self.words))
@@ -0,0 +1,68 @@
+"""Cold import cost of agent.py, measured with `python -X importtime`.
+
+Runs each import in a fresh interpreter and reports the cumulative time of
+the module plus its most expensive dependencies. With --max-ms it exits
+non-zero when the median exceeds the budget, so it can gate CI.
+
+Usage: python benchmarks/import_time.py [--module agent] [--runs 5] [--max-ms 500]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_profile(module: str):
+    """Return {module name: cumulative microseconds} for one cold import"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    env.setdefault("GROQ_API_KEY", "benchmark")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append((len(name) - len(name.lstrip()), name.strip(), int(cumulative_us)))
+
+    # Keep the target module and everything imported underneath it
+    target = next(i for i, entry in enumerate(entries) if entry[1] == module)
+    depth = entries[target][0]
+    profile = {module: entries[target][2]}
+    for indent, name, cumulative in reversed(entries[:target]):
+        if indent <= depth:
+            break
+        profile[name] = max(cumulative, profile.get(name, 0))
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="agent")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    profiles = [import_profile(args.module) for _ in range(args.runs)]
+    totals = [profile[args.module] / 1e3 for profile in profiles]
+    median = statistics.median(totals)
+
+    print(f"import {args.module}: median {median:.1f} ms  min {min(totals):.1f} ms  max {max(totals):.1f} ms")
+    print("slowest modules by cumulative time (last run):")
+    last = profiles[-1]
+    for name, cumulative in sorted(last.items(), key=lambda item: item[1], reverse=True)[1:args.top + 1]:
+        print(f"  {cumulative / 1e3:8.1f} ms  {name}")
+
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"FAIL: median import time {median:.1f} ms exceeds budget of {args.max_ms:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
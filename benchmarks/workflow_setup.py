@@ -0,0 +1,58 @@
+"""Per-request workflow setup overhead: rebuilding the graph vs the shared registry.
+
+Each series starts with one untimed call, so one-time imports, the
+checkpointer and (for the registry) the first compile are not counted.
+
+Usage: python benchmarks/workflow_setup.py [--requests 200]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep benchmark runs away from the real caches
+_scratch = tempfile.mkdtemp(prefix="workflow-setup-bench-")
+for name, file in [("TOOL_CACHE_PATH", "tools.sqlite"), ("LLM_CACHE_PATH", "llm.sqlite"),
+                   ("CHECKPOINT_PATH", "checkpoints.sqlite"), ("BLOB_STORE_PATH", "blobs.sqlite")]:
+    os.environ.setdefault(name, os.path.join(_scratch, file))
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+import agent
+
+
+def measure(setup, requests: int):
+    setup()  # warm-up, untimed
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        setup()
+        agent.make_run_config()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label: str, timings):
+    print(f"{label:<28} mean {statistics.mean(timings) * 1e3:8.3f} ms   "
+          f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1] * 1e3:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    before = measure(agent.build_enhanced_workflow, args.requests)
+    agent.workflows.clear()
+    after = measure(agent.get_workflow, args.requests)
+
+    report("before (compile per request)", before)
+    report("after (shared registry)", after)
+    print(f"speedup: {statistics.mean(before) / statistics.mean(after):.0f}x")
+
+
+if __name__ == "__main__":
+    main()
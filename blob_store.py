@@ -0,0 +1,103 @@
+from typing import Dict, Iterable, Optional
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+
+BLOB_STORE_PATH = os.getenv("BLOB_STORE_PATH", os.path.join(".cache", "research_blobs.sqlite"))
+# Kept at least as long as checkpoints so failed runs can still be resumed
+BLOB_MAX_AGE = float(os.getenv("BLOB_MAX_AGE", os.getenv("CHECKPOINT_MAX_AGE", str(7 * 24 * 60 * 60))))
+BLOB_PRUNE_EVERY = int(os.getenv("BLOB_PRUNE_EVERY", "500"))  # puts between prunes
+
+
+def content_ref(text: str) -> str:
+    return "sha256:" + hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class BlobStore:
+    """Content-addressed SQLite store for research text.
+
+    Graph state carries only the refs returned by put(), so checkpoints
+    and Send payloads stay small, and identical text, from one report or
+    many, is stored once. Blobs not written or read within `max_age`
+    seconds are pruned every `prune_every` puts.
+    """
+
+    def __init__(self, path: str = BLOB_STORE_PATH, max_age: float = BLOB_MAX_AGE,
+                 prune_every: int = BLOB_PRUNE_EVERY):
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_age = max_age
+        self.prune_every = prune_every
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                ref TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS blobs_accessed ON blobs (accessed)")
+        self._conn.commit()
+
+    def put(self, text: str) -> str:
+        """Store text once and return its ref"""
+        ref = content_ref(text)
+        now = time.time()
+        raw = text.encode("utf-8")
+        with self._lock:
+            updated = self._conn.execute("UPDATE blobs SET accessed = ? WHERE ref = ?", (now, ref)).rowcount
+            if not updated:
+                self._conn.execute("INSERT INTO blobs (ref, data, size, accessed) VALUES (?, ?, ?, ?)",
+                                   (ref, zlib.compress(raw), len(raw), now))
+            self._puts += 1
+            if self.prune_every and self._puts % self.prune_every == 0:
+                self._prune(now - self.max_age)
+            self._conn.commit()
+        return ref
+
+    def get(self, ref: str) -> Optional[str]:
+        return self.get_many([ref]).get(ref)
+
+    def get_many(self, refs: Iterable[str]) -> Dict[str, str]:
+        """Text for every ref still stored, in one query"""
+        refs = list(dict.fromkeys(refs))
+        if not refs:
+            return {}
+        now = time.time()
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(refs), 500):
+                batch = refs[start:start + 500]
+                marks = ", ".join("?" * len(batch))
+                for ref, data in self._conn.execute(f"SELECT ref, data FROM blobs WHERE ref IN ({marks})", batch):
+                    found[ref] = zlib.decompress(data).decode("utf-8")
+                self._conn.execute(f"UPDATE blobs SET accessed = ? WHERE ref IN ({marks})", [now, *batch])
+            self._conn.commit()
+        return found
+
+    def _prune(self, cutoff: float) -> int:
+        return self._conn.execute("DELETE FROM blobs WHERE accessed < ?", (cutoff,)).rowcount
+
+    def prune(self, max_age: Optional[float] = None) -> int:
+        """Delete blobs untouched for max_age seconds; returns how many"""
+        with self._lock:
+            removed = self._prune(time.time() - (self.max_age if max_age is None else max_age))
+            self._conn.commit()
+            return removed
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            count, raw, stored = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM blobs"
+            ).fetchone()
+        return {"blobs": count, "bytes": raw, "stored_bytes": stored}
@@ -0,0 +1,125 @@
+from array import array
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+import os
+
+import numpy as np
+
+from context_packer import CHUNK_TOKENS, split_chunks
+from embeddings import EmbedFn, get_default_embedder
+
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+
+
+class ChunkStore:
+    """Compact columnar store for research chunks.
+
+    Chunk text lives in one string buffer addressed by (start, end) offsets,
+    per-chunk offsets and metadata in typed arrays, and embeddings in a single
+    contiguous float32 matrix, so scoring every chunk against a query is
+    one matrix-vector product. Embeddings are computed lazily in batches of
+    `batch_size` texts per embed_fn call.
+    """
+
+    def __init__(self, embed_fn: Optional[EmbedFn] = None, batch_size: int = EMBED_BATCH_SIZE):
+        self.embed_fn = embed_fn or get_default_embedder()
+        self.batch_size = batch_size
+        self._parts: List[str] = []
+        self._length = 0
+        self._buffer = ""
+        self._starts = array("q")
+        self._ends = array("q")
+        self._query_ids = array("l")
+        self._priors = array("f")
+        self.queries: List[str] = []
+        self.sources: List[str] = []
+        self._query_lookup = {}
+        self._embeddings = None
+        self._embedded = 0
+
+    def __len__(self):
+        return len(self._starts)
+
+    def add(self, query: str, text: str, relevance_score: float = 0.0, source: str = ""):
+        """Append one chunk"""
+        if query not in self._query_lookup:
+            self._query_lookup[query] = len(self.queries)
+            self.queries.append(query)
+            self.sources.append(source)
+        self._starts.append(self._length)
+        self._parts.append(text)
+        self._length += len(text)
+        self._ends.append(self._length)
+        self._query_ids.append(self._query_lookup[query])
+        self._priors.append(relevance_score)
+
+    def add_results(self, results: Iterable, chunk_tokens: int = CHUNK_TOKENS):
+        """Chunk and append ResearchResult-like objects"""
+        for result in results:
+            for text in split_chunks(result.content, chunk_tokens):
+                self.add(result.query, text, result.relevance_score, getattr(result, "source", ""))
+
+    @property
+    def buffer(self) -> str:
+        if self._parts:
+            self._buffer += "".join(self._parts)
+            self._parts = []
+        return self._buffer
+
+    def text(self, i: int) -> str:
+        return self.buffer[self._starts[i]:self._ends[i]]
+
+    def query(self, i: int) -> str:
+        return self.queries[self._query_ids[i]]
+
+    def prior(self, i: int) -> float:
+        return self._priors[i]
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """(n, dim) float32 matrix, embedding any new chunks in batches"""
+        total = len(self)
+        if self._embedded < total:
+            buffer = self.buffer
+            matrix = None
+            for start in range(self._embedded, total, self.batch_size):
+                end = min(start + self.batch_size, total)
+                texts = [buffer[self._starts[i]:self._ends[i]] for i in range(start, end)]
+                batch = np.asarray(self.embed_fn(texts), dtype=np.float32)
+                if matrix is None:
+                    # Grow once, then fill batches in place
+                    matrix = np.empty((total, batch.shape[1]), dtype=np.float32)
+                    if self._embedded:
+                        matrix[:self._embedded] = self._embeddings
+                matrix[start:end] = batch
+            self._embeddings = matrix
+            self._embedded = total
+        if self._embeddings is None:
+            return np.zeros((0, getattr(self.embed_fn, "dim", 0)), dtype=np.float32)
+        return self._embeddings
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return np.ascontiguousarray(self.embed_fn([text]), dtype=np.float32)[0]
+
+    def scores(self, vector: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every chunk to a normalized query vector"""
+        return self.embeddings @ vector
+
+    def top_k(self, text: str, k: int) -> List[Tuple[int, float]]:
+        """Indices and scores of the k chunks most similar to `text`"""
+        if not len(self):
+            return []
+        scores = self.scores(self.embed_query(text))
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def source_counts(self) -> Counter:
+        """How many queries each source contributed to"""
+        counts = Counter()
+        for source in self.sources:
+            for name in filter(None, (part.strip() for part in source.split(","))):
+                counts[name] += 1
+        return counts
@@ -0,0 +1,155 @@
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+import os
+import threading
+import time
+
+import telemetry
+
+
+# Rolling window of recent calls per tool, and when it trips the breaker
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "3"))
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+# Seconds an open breaker rejects calls before letting one probe through
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a tool whose breaker is open"""
+
+    def __init__(self, tool: str):
+        super().__init__(f"{tool} is unavailable (circuit open)")
+        self.tool = tool
+
+
+class CircuitBreaker:
+    """Stops calling a backend that keeps failing.
+
+    Closed: calls go through and outcomes fill a rolling window; once it
+    holds `min_calls` outcomes with at least `error_rate` failures the
+    breaker opens. Open: calls are rejected for `cooldown` seconds, then
+    the breaker goes half-open and lets a single probe through. Half-open:
+    the probe's success closes the breaker, its failure reopens it.
+    """
+
+    def __init__(self, name: str, window: int = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 error_rate: float = BREAKER_ERROR_RATE, cooldown: float = BREAKER_COOLDOWN,
+                 on_change: Optional[Callable[["CircuitBreaker", str], None]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.trips = 0
+        self.rejected = 0
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self._on_change = on_change
+        self._clock = clock
+        self._lock = threading.RLock()
+
+    def allow(self, probe: bool = True) -> bool:
+        """Whether a call may go to the backend now.
+
+        With probe=False a half-open breaker says whether its probe is free
+        without taking it, for callers that ask again just before calling.
+        """
+        with self._lock:
+            now = self._clock()
+            if self.state == OPEN and now - self._opened_at >= self.cooldown:
+                self._set(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                # One probe at a time; a probe that never reported back is replaced after a cooldown
+                if self._probe_started is None or now - self._probe_started >= self.cooldown:
+                    if probe:
+                        self._probe_started = now
+                    return True
+            elif self.state == CLOSED:
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, ok: bool):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_started = None
+                if ok:
+                    self._outcomes.clear()
+                    self._set(CLOSED)
+                else:
+                    self._open()
+                return
+            self._outcomes.append(ok)
+            if self.state == CLOSED and len(self._outcomes) >= self.min_calls and self._failure_rate() >= self.error_rate:
+                self._open()
+
+    def _failure_rate(self) -> float:
+        return sum(1 for ok in self._outcomes if not ok) / len(self._outcomes) if self._outcomes else 0.0
+
+    def _open(self):
+        self._opened_at = self._clock()
+        self.trips += 1
+        self._set(OPEN)
+
+    def _set(self, state: str):
+        if state == self.state:
+            return
+        self.state = state
+        if self._on_change is not None:
+            try:
+                self._on_change(self, state)
+            except Exception:
+                pass  # reporting must never break a call
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "error_rate": round(self._failure_rate(), 3),
+                    "calls": len(self._outcomes), "trips": self.trips, "rejected": self.rejected}
+
+
+class HealthRegistry:
+    """Process-wide breakers, one per tool, shared by every report.
+
+    Listeners are called with (tool, state) whenever a breaker changes
+    state.
+    """
+
+    def __init__(self, **breaker_options):
+        self.breaker_options = breaker_options
+        self.listeners: List[Callable[[str, str], None]] = []
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, tool: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(tool)
+            if breaker is None:
+                breaker = self._breakers[tool] = CircuitBreaker(tool, on_change=self._changed,
+                                                                **self.breaker_options)
+            return breaker
+
+    def _changed(self, breaker: CircuitBreaker, state: str):
+        for listener in list(self.listeners):
+            listener(breaker.name, state)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {name: breaker.snapshot() for name, breaker in breakers.items()}
+
+
+def _report_change(tool: str, state: str):
+    telemetry.telemetry.event("circuit", tool, state=state)
+    if state == OPEN:
+        telemetry.count("tool_circuit_opened")  # on the trace of the run whose call tripped it
+
+
+tool_health = HealthRegistry()
+tool_health.listeners.append(_report_change)
@@ -0,0 +1,186 @@
+from collections import Counter
+from typing import Iterable, List, Optional, Sequence
+import math
+import os
+import re
+import threading
+
+
+# Per-section research budget sent to the writers, in prompt tokens
+SECTION_CONTEXT_TOKENS = int(os.getenv("SECTION_CONTEXT_TOKENS", "1500"))
+# Cap on each tool output kept in research results, in tokens
+RESEARCH_SOURCE_TOKENS = int(os.getenv("RESEARCH_SOURCE_TOKENS", "1200"))
+CHUNK_TOKENS = int(os.getenv("CONTEXT_CHUNK_TOKENS", "120"))
+TIKTOKEN_ENCODING = os.getenv("TIKTOKEN_ENCODING", "o200k_base")
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+PIECE_RE = re.compile(r"\s*\w+|\s*[^\w\s]+|\s+")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have how in into is it its of on or that the this
+to was were what when where which who why will with about between using use vs
+""".split())
+
+
+class _ApproxEncoding:
+    """Word/punctuation pieces; used when the tiktoken vocabulary is unavailable"""
+
+    name = "approx"
+
+    def encode(self, text: str) -> List[str]:
+        return PIECE_RE.findall(text)
+
+    def decode(self, tokens: Sequence[str]) -> str:
+        return "".join(tokens)
+
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def get_encoding():
+    """tiktoken encoding for budgeting, loaded once.
+
+    tiktoken downloads its vocabulary on first use; offline we fall back to
+    a word-level approximation so packing still works.
+    """
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding(TIKTOKEN_ENCODING)
+                except Exception:
+                    _encoding = _ApproxEncoding()
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    return len(get_encoding().encode(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens, marking the cut with an ellipsis"""
+    encoding = get_encoding()
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens]).rstrip() + "..."
+
+
+def terms(text: str) -> List[str]:
+    return [word for word in WORD_RE.findall(text.lower()) if word not in STOPWORDS]
+
+
+def split_chunks(text: str, chunk_tokens: int = CHUNK_TOKENS) -> List[str]:
+    """Split text on sentence boundaries into chunks of about chunk_tokens"""
+    chunks, current, size = [], [], 0
+    for sentence in SENTENCE_RE.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        tokens = count_tokens(sentence)
+        if current and size + tokens > chunk_tokens:
+            chunks.append(" ".join(current))
+            current, size = [], 0
+        current.append(sentence)
+        size += tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def _shingles(text: str, n: int = 5) -> set:
+    words = WORD_RE.findall(text.lower())
+    if len(words) < n:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+class Chunk:
+    __slots__ = ("query", "text", "order", "prior", "score", "tokens", "shingles")
+
+    def __init__(self, query: str, text: str, order: int, prior: float):
+        self.query = query
+        self.text = text
+        self.order = order
+        self.prior = prior
+        self.score = 0.0
+        self.tokens = 0
+        self.shingles = None
+
+
+def rank_chunks(chunks: List[Chunk], focus: str) -> List[Chunk]:
+    """Score chunks by BM25 overlap with the focus text, boosted by query priority"""
+    focus_terms = set(terms(focus))
+    if not chunks:
+        return []
+    chunk_terms = [Counter(terms(chunk.text)) for chunk in chunks]
+    avg_len = sum(sum(c.values()) for c in chunk_terms) / len(chunks) or 1.0
+    doc_freq = Counter(term for counts in chunk_terms for term in counts)
+    k1, b = 1.2, 0.75
+    for chunk, counts in zip(chunks, chunk_terms):
+        length = sum(counts.values())
+        score = 0.0
+        for term in focus_terms:
+            tf = counts.get(term, 0)
+            if not tf:
+                continue
+            idf = math.log(1 + (len(chunks) - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_len))
+        chunk.score = score * (0.5 + chunk.prior)
+    return sorted(chunks, key=lambda chunk: (-chunk.score, chunk.order))
+
+
+def pack_context(results: Iterable, focus: str, budget: int = SECTION_CONTEXT_TOKENS,
+                 overlap_threshold: float = 0.6, chunk_tokens: int = CHUNK_TOKENS) -> str:
+    """Fit the most relevant, non-redundant research into `budget` tokens.
+
+    `results` are ResearchResult-like objects (query, content,
+    relevance_score). Content is chunked, ranked against `focus`, and
+    chunks mostly covered by an already selected chunk are skipped as
+    duplicates. Selected chunks are grouped back under their query.
+    """
+    chunks = []
+    for result in results:
+        for text in split_chunks(result.content, chunk_tokens):
+            chunks.append(Chunk(result.query, text, len(chunks), getattr(result, "relevance_score", 0.0)))
+
+    selected, used = [], 0
+    header_tokens = {}
+    for chunk in rank_chunks(chunks, focus):
+        chunk.shingles = _shingles(chunk.text)
+        if any(_overlap(chunk.shingles, other.shingles) >= overlap_threshold for other in selected):
+            continue
+        chunk.tokens = count_tokens(chunk.text) + 1
+        header = 0 if chunk.query in header_tokens else count_tokens(f"Research Query: {chunk.query}\nFindings:") + 2
+        if used + chunk.tokens + header > budget:
+            continue
+        header_tokens[chunk.query] = header
+        selected.append(chunk)
+        used += chunk.tokens + header
+
+    # Token counts don't add exactly across joins; trim until the rendering fits
+    context = _render(selected)
+    while selected and count_tokens(context) > budget:
+        selected.pop()
+        context = _render(selected)
+    return context
+
+
+def _render(selected: List[Chunk]) -> str:
+    """Group chunks by query (best chunk first), in source order within a query"""
+    blocks = []
+    for query in dict.fromkeys(chunk.query for chunk in selected):
+        texts = [chunk.text for chunk in sorted(selected, key=lambda c: c.order) if chunk.query == query]
+        blocks.append(f"Research Query: {query}\nFindings:\n" + "\n".join(texts))
+    return "\n\n".join(blocks)
+
+
+def _overlap(a: set, b: Optional[set]) -> float:
+    """Share of the smaller shingle set contained in the other"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
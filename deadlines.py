@@ -0,0 +1,48 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+import time
+
+
+# Epoch time by which the work running in this context must finish
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Work ran out of time under the current deadline.
+
+    Tools let it through instead of turning it into an "Error..." result,
+    so running late is never mistaken for the backend failing.
+    """
+
+
+def current_deadline() -> Optional[float]:
+    return _deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline (never negative), or None without one"""
+    deadline = _deadline.get()
+    return None if deadline is None else max(0.0, deadline - time.time())
+
+
+def passed() -> bool:
+    """Whether the current deadline, if there is one, has passed"""
+    return remaining() == 0
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]):
+    """Run the block, and contexts copied from it, under `deadline`.
+
+    An earlier deadline already in force wins; None keeps the current one.
+    """
+    outer = _deadline.get()
+    if deadline is None or (outer is not None and outer < deadline):
+        deadline = outer
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
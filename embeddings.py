@@ -0,0 +1,74 @@
+from functools import lru_cache
+from typing import Callable, Sequence
+import hashlib
+import os
+import re
+
+import numpy as np
+
+
+# Any callable mapping a batch of texts to an (n, dim) float32 matrix
+EmbedFn = Callable[[Sequence[str]], np.ndarray]
+
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "384"))
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+@lru_cache(maxsize=200_000)
+def _feature_slot(feature: str, dim: int):
+    digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest % dim, (1.0 if digest >> 63 else -1.0)
+
+
+class HashingEmbedder:
+    """Deterministic local embeddings from hashed word unigrams and bigrams.
+
+    Needs no model download or network access, so it is the default for
+    cache lookups and retrieval, and gives stable results in benchmarks.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        rows, slots, signs = [], [], []
+        for row, text in enumerate(texts):
+            tokens = TOKEN_RE.findall(text.lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                slot, sign = _feature_slot(feature, self.dim)
+                rows.append(row)
+                slots.append(slot)
+                signs.append(sign)
+        # One scatter-add for the whole batch
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(vectors, (rows, slots), signs)
+        return normalize_rows(vectors)
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row in place so dot products are cosine similarities"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
+
+
+def load_faiss():
+    """faiss-cpu if installed, else None; imported only when an index is built"""
+    try:
+        import faiss
+    except ImportError:
+        faiss = None
+    return faiss
+
+
+_default_embedder = None
+
+
+def get_default_embedder() -> EmbedFn:
+    global _default_embedder
+    if _default_embedder is None:
+        _default_embedder = HashingEmbedder()
+    return _default_embedder
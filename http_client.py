@@ -0,0 +1,110 @@
+from typing import Any, Dict, Optional
+import asyncio
+import os
+import threading
+import weakref
+
+import deadlines
+
+
+# Pool and timeout settings shared by every tool client
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "15"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+
+DEFAULT_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+_session = None
+_session_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_session():
+    """Process-wide requests.Session with pooled keep-alive connections"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                retry = Retry(total=HTTP_RETRIES, backoff_factor=0.3,
+                              status_forcelist=(502, 503, 504), allowed_methods=("GET",))
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE,
+                                      max_retries=retry)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def request_timeout():
+    """(connect, read) timeouts, cut to the time left before the current deadline"""
+    left = deadlines.remaining()
+    if left is None:
+        return DEFAULT_TIMEOUT
+    if left <= 0:
+        raise deadlines.DeadlineExceeded("deadline passed before the request was sent")
+    return (min(HTTP_CONNECT_TIMEOUT, left), min(HTTP_READ_TIMEOUT, left))
+
+
+def get_json(url: str, params: Optional[Dict[str, Any]] = None, timeout=None):
+    """GET a JSON document over the shared session; returns (status_code, json or None)"""
+    from requests import RequestException
+
+    try:
+        response = get_session().get(url, params=params, timeout=timeout or request_timeout())
+    except RequestException as e:
+        # A timeout cut short by the deadline is the deadline's doing, not the server's
+        if deadlines.passed():
+            raise deadlines.DeadlineExceeded(f"deadline passed during the request: {e}") from e
+        raise
+    try:
+        data = response.json()
+    except ValueError:
+        data = None
+    return response.status_code, data
+
+
+def get_async_client():
+    """httpx.AsyncClient for the running event loop, with the same pool limits.
+
+    Async clients are bound to the loop that created them, so one is kept
+    per loop and discarded with it.
+    """
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE),
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            transport=httpx.AsyncHTTPTransport(retries=HTTP_RETRIES),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def aget_json(url: str, params: Optional[Dict[str, Any]] = None, timeout=None):
+    """Async get_json over the loop's pooled httpx client"""
+    import httpx
+
+    if timeout is None and deadlines.current_deadline() is not None:
+        connect, read = request_timeout()
+        timeout = httpx.Timeout(read, connect=connect)
+    kwargs = {} if timeout is None else {"timeout": timeout}
+    try:
+        response = await get_async_client().get(url, params=params, **kwargs)
+    except httpx.TransportError as e:
+        if deadlines.passed():
+            raise deadlines.DeadlineExceeded(f"deadline passed during the request: {e}") from e
+        raise
+    try:
+        data = response.json()
+    except ValueError:
+        data = None
+    return response.status_code, data
@@ -0,0 +1,265 @@
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import os
+import threading
+import time
+import uuid
+
+
+# Worker pool sizing
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "100"))
+JOB_MAX_QUEUED_PER_USER = int(os.getenv("JOB_MAX_QUEUED_PER_USER", "3"))
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", "500"))  # finished jobs kept for polling
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class QueueFull(Exception):
+    """The queue, or this user's share of it, is at capacity"""
+
+
+class Job:
+    """One report request and the events its run has produced so far.
+
+    Events are numbered in publish order. When the job finishes its token
+    events are dropped - the section and report events carry the same
+    text - so the finished jobs kept for polling stay small; cursors are
+    event numbers, so they stay valid across that.
+    """
+
+    def __init__(self, user_id: str, topic: str, context: str = "", options: Optional[Dict[str, Any]] = None):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.topic = topic
+        self.context = context
+        self.options = dict(options or {})
+        self.status = QUEUED
+        self.result: Optional[str] = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.events: List[Dict[str, Any]] = []
+        self.published = 0  # events published so far, kept or not
+        self._numbers: List[int] = []  # publish number of each kept event
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    @property
+    def resume_thread_id(self) -> Optional[str]:
+        """The checkpointed thread a failed run left behind, to resume instead of starting over"""
+        with self._cond:
+            return next((event["thread_id"] for event in reversed(self.events) if event.get("thread_id")), None)
+
+    def publish(self, event: Dict[str, Any]):
+        with self._cond:
+            self.events.append(event)
+            self._numbers.append(self.published)
+            self.published += 1
+            self._cond.notify_all()
+
+    def _finish(self, status: str, result: Optional[str] = None, error: Optional[str] = None):
+        with self._cond:
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+            kept = [(number, event) for number, event in zip(self._numbers, self.events) if event["type"] != "token"]
+            self._numbers = [number for number, _ in kept]
+            self.events = [event for _, event in kept]
+            self._cond.notify_all()
+
+    def events_since(self, cursor: int, timeout: Optional[float] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Events published from number `cursor` on, and the cursor for the next call.
+
+        Waits up to `timeout` for new events while the job runs.
+        """
+        with self._cond:
+            if self.published <= cursor and not self.finished and timeout:
+                self._cond.wait(timeout)
+            return self.events[bisect_left(self._numbers, cursor):], self.published
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: self.finished, timeout)
+
+
+class JobQueue:
+    """Bounded worker pool for report jobs with fair scheduling across users.
+
+    Each user has a FIFO of pending jobs and workers take from the users in
+    round-robin order, so one user submitting many reports cannot starve
+    the others. `runner(job)` executes a job, publishing progress events
+    with job.publish() and returning the final report.
+    """
+
+    def __init__(self, runner: Callable[[Job], str], workers: int = JOB_WORKERS,
+                 max_queued: int = JOB_MAX_QUEUED, max_queued_per_user: int = JOB_MAX_QUEUED_PER_USER,
+                 retention: int = JOB_RETENTION):
+        self.runner = runner
+        self.max_queued = max_queued
+        self.max_queued_per_user = max_queued_per_user
+        self.retention = retention
+        self._pending: "OrderedDict[str, deque]" = OrderedDict()  # user -> queued jobs, in round-robin order
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queued = 0
+        self._running = 0
+        self._counts = {DONE: 0, FAILED: 0}
+        self._wait_total = 0.0
+        self._run_total = 0.0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._workers = [
+            threading.Thread(target=self._work, name=f"report-worker-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, user_id: str, topic: str, context: str = "", options: Optional[Dict[str, Any]] = None) -> str:
+        """Queue a report request and return its job id"""
+        job = Job(user_id, topic, context, options)
+        with self._cond:
+            if self._closed:
+                raise QueueFull("Job queue is shut down")
+            if self._queued >= self.max_queued:
+                raise QueueFull(f"Job queue is full ({self._queued} reports waiting)")
+            user_queue = self._pending.setdefault(user_id, deque())
+            if len(user_queue) >= self.max_queued_per_user:
+                raise QueueFull(f"You already have {len(user_queue)} reports waiting")
+            user_queue.append(job)
+            self._queued += 1
+            self._jobs[job.id] = job
+            self._cond.notify()
+        return job.id
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def position(self, job_id: str) -> Optional[int]:
+        """Jobs scheduled ahead of a queued job under round-robin order, or None"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return None
+            queues = [list(q) for q in self._pending.values()]
+            ahead = 0
+            for depth in range(max(len(q) for q in queues)):
+                for queue in queues:
+                    if depth < len(queue):
+                        if queue[depth] is job:
+                            return ahead
+                        ahead += 1
+            return None
+
+    def _next_job(self) -> Optional[Job]:
+        """Pop the head of the next user's queue and rotate that user to the back"""
+        while not self._closed and not self._queued:
+            self._cond.wait()
+        if self._closed:
+            return None
+        user_id, user_queue = next(iter(self._pending.items()))
+        job = user_queue.popleft()
+        del self._pending[user_id]
+        if user_queue:
+            self._pending[user_id] = user_queue
+        self._queued -= 1
+        self._running += 1
+        job.status = RUNNING
+        job.started_at = time.time()
+        self._wait_total += job.started_at - job.submitted_at
+        return job
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+            if job is None:
+                return
+            try:
+                job._finish(DONE, result=self.runner(job))
+            except Exception as e:
+                job._finish(FAILED, error=str(e))
+            with self._cond:
+                self._running -= 1
+                self._counts[job.status] += 1
+                self._run_total += job.finished_at - job.started_at
+                self._prune()
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond the retention limit"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.retention)]:
+            del self._jobs[job_id]
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth and throughput counters for sizing and dashboards"""
+        with self._cond:
+            completed = self._counts[DONE] + self._counts[FAILED]
+            return {
+                "queue_depth": self._queued,
+                "queue_depth_by_user": {user: len(q) for user, q in self._pending.items()},
+                "running": self._running,
+                "workers": len(self._workers),
+                "completed": self._counts[DONE],
+                "failed": self._counts[FAILED],
+                "avg_wait_seconds": self._wait_total / completed if completed else 0.0,
+                "avg_run_seconds": self._run_total / completed if completed else 0.0,
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Stop taking jobs; running jobs finish, queued ones are dropped"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+
+def run_report_job(job: Job) -> str:
+    """Default runner: stream the research workflow into the job's events.
+
+    A "resume" option (a failed job's resume_thread_id) finishes that run
+    from its checkpoint instead of starting over.
+    """
+    from agent import stream_enhanced_agent, stream_resumed_agent
+
+    options = dict(job.options)
+    resume = options.pop("resume", None)
+    if resume:
+        events = stream_resumed_agent(resume, **options)
+    else:
+        events = stream_enhanced_agent(job.topic, job.context, **options)
+
+    report = None
+    errors = []
+    for event in events:
+        job.publish(event)
+        if event["type"] == "report":
+            report = event["markdown"]
+        elif event["type"] == "error":
+            errors.append(event["message"])
+    if not report:
+        raise RuntimeError("; ".join(errors) or "No report was produced")
+    return report
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Process-wide queue shared by every Streamlit session"""
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue(run_report_job)
+    return _job_queue
@@ -0,0 +1,224 @@
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import telemetry
+
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.sqlite"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+LLM_CACHE_SEMANTIC = os.getenv("LLM_CACHE_SEMANTIC", "0").lower() in ("1", "true", "yes")
+LLM_CACHE_SIMILARITY = float(os.getenv("LLM_CACHE_SIMILARITY", "0.95"))
+
+
+def prompt_key(namespace: str, model: str, prompt: str) -> str:
+    return hashlib.sha256(f"{namespace}\0{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+def render_messages(messages) -> str:
+    """Flatten chat messages into the text that identifies a prompt"""
+    return "\n".join(f"{getattr(m, 'type', 'message')}: {getattr(m, 'content', m)}" for m in messages)
+
+
+class _SemanticIndex:
+    """Inner-product index over normalized prompt embeddings"""
+
+    def __init__(self, dim: int):
+        self.keys = []
+        self.vectors = []
+        from embeddings import load_faiss
+        faiss = load_faiss()  # falls back to a NumPy scan when missing
+        self.index = faiss.IndexFlatIP(dim) if faiss is not None else None
+
+    def add(self, key: str, vector):
+        self.keys.append(key)
+        self.vectors.append(vector)
+        if self.index is not None:
+            self.index.add(vector.reshape(1, -1))
+
+    def search(self, vector) -> Tuple[Optional[str], float]:
+        if not self.keys:
+            return None, 0.0
+        if self.index is not None:
+            scores, ids = self.index.search(vector.reshape(1, -1), 1)
+            best, score = int(ids[0][0]), float(scores[0][0])
+        else:
+            import numpy as np
+            scores = np.vstack(self.vectors) @ vector
+            best = int(scores.argmax())
+            score = float(scores[best])
+        if best < 0:
+            return None, 0.0
+        return self.keys[best], score
+
+
+class LLMCache:
+    """Two-tier cache for LLM generations.
+
+    The exact tier matches on a hash of (namespace, model, prompt). The
+    optional semantic tier embeds a caller-chosen `semantic_text` - the part
+    of the prompt that varies, not the template around it - and returns the
+    closest cached generation whose cosine similarity passes the threshold.
+    Entries persist in SQLite and the least recently used ones are evicted
+    past `max_entries`.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 semantic: bool = LLM_CACHE_SEMANTIC, similarity_threshold: float = LLM_CACHE_SIMILARITY,
+                 embed_fn: Optional[Callable] = None):
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_entries = max_entries
+        self.semantic = semantic
+        self.similarity_threshold = similarity_threshold
+        self._embed_fn = embed_fn
+        self.stats = Counter()
+        self._indexes: Dict[Tuple[str, str], _SemanticIndex] = {}
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                model TEXT NOT NULL,
+                value TEXT NOT NULL,
+                embedding BLOB,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed)")
+        self._conn.commit()
+
+    @property
+    def embed_fn(self):
+        if self._embed_fn is None:
+            from embeddings import get_default_embedder
+            self._embed_fn = get_default_embedder()
+        return self._embed_fn
+
+    def _embed(self, text: str):
+        return self.embed_fn([text])[0].astype("float32")
+
+    def _semantic_index(self, namespace: str, model: str) -> _SemanticIndex:
+        """Build the in-memory index for one (namespace, model) from disk on first use"""
+        import numpy as np
+        group = (namespace, model)
+        index = self._indexes.get(group)
+        if index is None:
+            rows = self._conn.execute(
+                "SELECT key, embedding FROM llm_cache "
+                "WHERE namespace = ? AND model = ? AND embedding IS NOT NULL",
+                group,
+            ).fetchall()
+            index = None
+            for key, blob in rows:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                if index is None:
+                    index = _SemanticIndex(vector.shape[0])
+                index.add(key, vector)
+            if index is None:
+                index = _SemanticIndex(self._embed("").shape[0])
+            self._indexes[group] = index
+        return index
+
+    def _read(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._conn.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (time.time(), key))
+        self._conn.commit()
+        return row[0]
+
+    def lookup(self, namespace: str, model: str, prompt: str,
+               semantic_text: Optional[str] = None) -> Optional[str]:
+        with self._lock:
+            value = self._read(prompt_key(namespace, model, prompt))
+            if value is not None:
+                self.stats["exact_hits"] += 1
+                telemetry.count("llm_cache_exact_hits")
+                return value
+
+            if self.semantic and semantic_text:
+                key, score = self._semantic_index(namespace, model).search(self._embed(semantic_text))
+                if key is not None and score >= self.similarity_threshold:
+                    value = self._read(key)
+                    if value is not None:
+                        self.stats["semantic_hits"] += 1
+                        telemetry.count("llm_cache_semantic_hits")
+                        return value
+
+            self.stats["misses"] += 1
+            telemetry.count("llm_cache_misses")
+            return None
+
+    def store(self, namespace: str, model: str, prompt: str, value: str,
+              semantic_text: Optional[str] = None):
+        key = prompt_key(namespace, model, prompt)
+        now = time.time()
+        with self._lock:
+            vector = None
+            if self.semantic and semantic_text:
+                vector = self._embed(semantic_text)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, namespace, model, value, embedding, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, namespace, model, value, vector.tobytes() if vector is not None else None, now, now),
+            )
+            if self._evict():
+                self._indexes.clear()  # rebuilt from disk on next semantic lookup
+            elif vector is not None and (namespace, model) in self._indexes:
+                self._indexes[(namespace, model)].add(key, vector)
+            self._conn.commit()
+
+    def _evict(self) -> bool:
+        count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return False
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE key IN "
+            "(SELECT key FROM llm_cache ORDER BY accessed ASC LIMIT ?)",
+            (excess,),
+        )
+        return True
+
+    def cached(self, namespace: str, model: str, prompt: str, compute: Callable[[], Any],
+               encode: Callable[[Any], str] = str, decode: Callable[[str], Any] = lambda v: v,
+               semantic_text: Optional[str] = None, bypass: bool = False):
+        """Return a cached generation or compute and store a fresh one.
+
+        With `bypass` the lookup is skipped but the fresh result still
+        replaces what was cached.
+        """
+        if not bypass:
+            value = self.lookup(namespace, model, prompt, semantic_text)
+            if value is not None:
+                return decode(value)
+        result = compute()
+        self.store(namespace, model, prompt, encode(result), semantic_text)
+        return result
+
+    async def acached(self, namespace: str, model: str, prompt: str, compute: Callable[[], Awaitable[Any]],
+                      encode: Callable[[Any], str] = str, decode: Callable[[str], Any] = lambda v: v,
+                      semantic_text: Optional[str] = None, bypass: bool = False):
+        """cached() for coroutines; SQLite and embedding work runs in a worker thread"""
+        if not bypass:
+            value = await asyncio.to_thread(self.lookup, namespace, model, prompt, semantic_text)
+            if value is not None:
+                return decode(value)
+        result = await compute()
+        await asyncio.to_thread(self.store, namespace, model, prompt, encode(result), semantic_text)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+            self._indexes.clear()
@@ -0,0 +1,258 @@
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, List, Optional, Tuple
+import asyncio
+import os
+import random
+import threading
+import time
+
+import telemetry
+
+
+# Client-side limits for the Groq API (defaults match the free tier for gpt-oss-20b)
+GROQ_RPM = float(os.getenv("GROQ_RPM", "30"))
+GROQ_TPM = float(os.getenv("GROQ_TPM", "8000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_INITIAL_CONCURRENCY = int(os.getenv("LLM_INITIAL_CONCURRENCY", "4"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_CAP = float(os.getenv("LLM_BACKOFF_CAP", "60"))
+# Completion tokens charged against the TPM budget before a call returns
+LLM_EXPECTED_COMPLETION_TOKENS = int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "1500"))
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute up to one minute's worth.
+
+    acquire() reserves units immediately, letting the balance go negative,
+    and sleeps until the reservation is covered, so callers are served in
+    arrival order without holding the lock while they wait.
+    """
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """Reserve units and return how long to wait before using them"""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = self._clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self, amount: float = 1.0) -> float:
+        wait = self.reserve(amount)
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limit: +1 per window of successes, halved on throttling.
+
+    Threads wait in acquire(); coroutines wait in aacquire() without
+    holding a thread, on whichever event loop they run.
+    """
+
+    def __init__(self, initial: int = LLM_INITIAL_CONCURRENCY, minimum: int = 1,
+                 maximum: int = LLM_MAX_CONCURRENCY):
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.limit = float(min(max(initial, minimum), self.maximum))
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            await waiter
+
+    def release(self, throttled: bool = False, success: bool = True):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(float(self.minimum), self.limit / 2)
+            elif success:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+            waiters, self._waiters = self._waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+
+
+def _wake(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+def status_code(error: Exception) -> Optional[int]:
+    code = getattr(error, "status_code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code
+
+
+def is_rate_limited(error: Exception) -> bool:
+    return status_code(error) == 429 or "RateLimit" in type(error).__name__
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors and connection problems are worth retrying"""
+    if is_rate_limited(error):
+        return True
+    code = status_code(error)
+    if code is not None:
+        return code >= 500
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait, from Retry-After if present"""
+    value = getattr(error, "retry_after", None)
+    if value is None:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        value = headers.get("retry-after") or headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMScheduler:
+    """Client-side scheduler for chat model calls.
+
+    Every call waits for a request-per-minute and a token-per-minute budget
+    and for a slot under an AIMD concurrency limit. Rate-limit, server and
+    connection errors are retried with full-jitter exponential backoff,
+    waiting at least as long as any Retry-After the server sent.
+    """
+
+    def __init__(self, rpm: float = GROQ_RPM, tpm: float = GROQ_TPM,
+                 concurrency: Optional[AdaptiveConcurrency] = None,
+                 max_retries: int = LLM_MAX_RETRIES, backoff_base: float = LLM_BACKOFF_BASE,
+                 backoff_cap: float = LLM_BACKOFF_CAP, count_tokens: Optional[Callable[[Any], int]] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.requests = TokenBucket(rpm, sleep=sleep) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm, sleep=sleep) if tpm > 0 else None
+        self.concurrency = concurrency or AdaptiveConcurrency()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.count_tokens = count_tokens
+        self.stats = Counter()
+        self._sleep = sleep
+
+    def estimate_tokens(self, messages) -> int:
+        if self.count_tokens is None:
+            from context_packer import count_tokens
+            from llm_cache import render_messages
+            self.count_tokens = lambda msgs: count_tokens(render_messages(msgs))
+        return self.count_tokens(messages) + LLM_EXPECTED_COMPLETION_TOKENS
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        server_delay = retry_after(error)
+        if server_delay is not None:
+            delay = max(delay, server_delay + random.uniform(0, self.backoff_base))
+        return delay
+
+    def invoke(self, runnable, messages, **kwargs):
+        """runnable.invoke(messages) under the rate limits, retrying transient failures"""
+        tokens = self.estimate_tokens(messages) if self.tokens is not None else 0
+        attempt = 0
+        while True:
+            waited = 0.0
+            if self.requests is not None:
+                waited += self.requests.acquire(1)
+            if self.tokens is not None:
+                waited += self.tokens.acquire(tokens)
+            if waited:
+                telemetry.count("llm_rate_limit_wait_seconds", waited)
+            self.concurrency.acquire()
+            try:
+                result = runnable.invoke(messages, **kwargs)
+            except Exception as e:
+                self._sleep(self._failed(e, attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                # KeyboardInterrupt, SystemExit and the like must not leak the slot
+                self.concurrency.release(success=False)
+                raise
+            self._succeeded()
+            return result
+
+    async def ainvoke(self, runnable, messages, **kwargs):
+        """Async invoke(): waits for budgets and slots on the event loop, then awaits runnable.ainvoke"""
+        tokens = self.estimate_tokens(messages) if self.tokens is not None else 0
+        attempt = 0
+        while True:
+            # Both budgets are reserved at once, so the wait is the longer of the two
+            waited = 0.0
+            if self.requests is not None:
+                waited = max(waited, self.requests.reserve(1))
+            if self.tokens is not None:
+                waited = max(waited, self.tokens.reserve(tokens))
+            if waited:
+                telemetry.count("llm_rate_limit_wait_seconds", waited)
+                await asyncio.sleep(waited)
+            await self.concurrency.aacquire()
+            try:
+                result = await runnable.ainvoke(messages, **kwargs)
+            except asyncio.CancelledError:
+                self.concurrency.release(success=False)
+                raise
+            except Exception as e:
+                await asyncio.sleep(self._failed(e, attempt))
+                attempt += 1
+                continue
+            self._succeeded()
+            return result
+
+    def _succeeded(self):
+        self.concurrency.release(success=True)
+        self.stats["calls"] += 1
+
+    def _failed(self, error: Exception, attempt: int) -> float:
+        """Account for a failed call; returns the backoff before retrying, or raises it"""
+        throttled = is_rate_limited(error)
+        self.concurrency.release(throttled=throttled, success=False)
+        if throttled:
+            self.stats["throttled"] += 1
+            telemetry.count("llm_throttled")
+        if attempt >= self.max_retries or not is_retryable(error):
+            self.stats["failures"] += 1
+            raise error
+        self.stats["retries"] += 1
+        telemetry.count("llm_retries")
+        return self.backoff(attempt, error)
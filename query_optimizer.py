@@ -0,0 +1,103 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, FrozenSet, List, Optional, Sequence, Tuple
+import os
+import re
+
+import numpy as np
+
+from embeddings import TOKEN_RE, EmbedFn, get_default_embedder
+
+
+# Queries are researched once only when at least this similar (cosine over
+# embeddings of their content terms)...
+QUERY_MERGE_THRESHOLD = float(os.getenv("QUERY_MERGE_THRESHOLD", "0.9"))
+# ...and when their sets of content terms overlap at least this much (Jaccard),
+# so queries differing in a key term ("hardware" vs "software") stay apart
+QUERY_MERGE_MIN_OVERLAP = float(os.getenv("QUERY_MERGE_MIN_OVERLAP", "0.8"))
+
+# Words that carry no topic; years are dropped too, as planners tack them onto most queries
+STOPWORDS = frozenset("""
+    a about after an and are as at be before between by can do does for from how in into is it its of on or
+    over than that the their this to under vs what when where which who why will with within
+""".split())
+YEAR_RE = re.compile(r"^(19|20)\d\d$")
+
+
+def content_terms(query: str) -> List[str]:
+    """The query's words without stopwords and years, plurals folded, in order"""
+    terms = []
+    for token in TOKEN_RE.findall(query.lower()):
+        if token in STOPWORDS or YEAR_RE.match(token):
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+def term_overlap(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Jaccard overlap of two term sets"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass
+class QueryCluster:
+    """Near-duplicate queries researched once, through the canonical query"""
+    canonical: Any  # highest-priority member
+    members: List[Any] = field(default_factory=list)
+    owners: List[str] = field(default_factory=list)  # sections that asked
+
+    @property
+    def priority(self) -> int:
+        return self.canonical.priority
+
+
+def cluster_queries(queries: Sequence[Tuple[str, Any]], threshold: float = QUERY_MERGE_THRESHOLD,
+                    embed_fn: Optional[EmbedFn] = None,
+                    partition: Optional[Callable[[str], Any]] = None,
+                    min_overlap: float = QUERY_MERGE_MIN_OVERLAP) -> List[QueryCluster]:
+    """Group (owner, query) pairs whose query text is near-identical.
+
+    Queries (anything with .query and .priority) are visited highest
+    priority first, plan order breaking ties. Each joins the most similar
+    cluster whose canonical query is at least `threshold` similar and
+    shares at least `min_overlap` of its content terms, or starts its own,
+    so clusters come back in priority order. Similarity is measured on the
+    content terms alone (see content_terms), in any order. Queries for
+    which `partition` differs (e.g. news vs reference queries) never merge.
+    """
+    if not queries:
+        return []
+    terms = [content_terms(q.query) for _, q in queries]
+    # Sorted, so the same terms in another order embed the same
+    texts = [" ".join(sorted(words)) or q.query.lower() for words, (_, q) in zip(terms, queries)]
+    vectors = np.asarray((embed_fn or get_default_embedder())(texts), dtype=np.float32)
+    term_sets = [frozenset(words) for words in terms]
+    order = sorted(range(len(queries)), key=lambda i: -queries[i][1].priority)
+
+    clusters: List[QueryCluster] = []
+    centers, groups, canonical_terms = [], [], []
+    for i in order:
+        owner, query = queries[i]
+        group = partition(query.query) if partition else None
+        target = None
+        if clusters:
+            similarities = np.stack(centers) @ vectors[i]
+            for j in np.argsort(-similarities, kind="stable"):
+                if similarities[j] < threshold:
+                    break
+                if groups[j] == group and term_overlap(canonical_terms[j], term_sets[i]) >= min_overlap:
+                    target = clusters[j]
+                    break
+        if target is None:
+            target = QueryCluster(canonical=query)
+            clusters.append(target)
+            centers.append(vectors[i])
+            groups.append(group)
+            canonical_terms.append(term_sets[i])
+        target.members.append(query)
+        if owner not in target.owners:
+            target.owners.append(owner)
+    return clusters
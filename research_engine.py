@@ -0,0 +1,453 @@
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+import asyncio
+import os
+import threading
+import time
+import weakref
+
+import deadlines
+import telemetry
+from circuit_breaker import CircuitOpenError, HealthRegistry, tool_health
+from deadlines import DeadlineExceeded
+from single_flight import SingleFlight
+from tool_cache import normalize_query, track_hits
+
+
+# Concurrency defaults (override through the environment)
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("RESEARCH_MAX_CONCURRENCY", "8"))
+DEFAULT_TOOL_LIMITS = os.getenv("RESEARCH_TOOL_LIMITS", "web_search=4,wikipedia=4,current_news=2")
+# Prefetched calls nobody claimed are dropped after this many seconds
+PREFETCH_TTL = float(os.getenv("RESEARCH_PREFETCH_TTL", "300"))
+# Send a duplicate of a call still running past this percentile of its tool's latency (0 = off)
+HEDGE_PERCENTILE = float(os.getenv("RESEARCH_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("RESEARCH_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WINDOW = int(os.getenv("RESEARCH_HEDGE_WINDOW", "200"))  # latencies kept per tool
+
+
+def parse_tool_limits(spec: str) -> Dict[str, int]:
+    """Parse a "tool=limit,tool=limit" string into a dict"""
+    limits = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        name, value = item.split("=", 1)
+        try:
+            limits[name.strip()] = max(1, int(value))
+        except ValueError:
+            continue
+    return limits
+
+
+@dataclass
+class ToolCall:
+    """Outcome of running one tool for one query"""
+    query: str
+    tool: str
+    output: Optional[str] = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+    timed_out: bool = False
+    rejected: bool = False  # not sent: the tool's circuit breaker is open
+    cached: bool = False  # answered from the tool cache, not the backend
+
+    @property
+    def ok(self) -> bool:
+        return self.output is not None
+
+
+class ResearchEngine:
+    """Fan (query, tool) pairs out over bounded thread pools.
+
+    `tools` maps a tool name to any callable taking the query string, so
+    local fakes with injected latency can stand in for the real backends.
+    Per-tool limits bound how many calls to the same backend can be in
+    flight at once; each limited tool runs on its own pool of that many
+    threads, so calls queued for a slow tool never hold threads another
+    tool needs. The global limit caps every tool's limit and sizes the
+    pool shared by tools without one. Identical
+    (tool, query) calls in flight at the same time, from this report or
+    any other, share one backend call.
+
+    Calls can also be started early with prefetch(); research() then
+    picks up the running or finished call instead of starting its own.
+
+    A call still running past `hedge_percentile` of its tool's recent
+    latencies gets a duplicate request when the tool has a free slot; the
+    first answer wins. research() stops waiting at the deadline and
+    reports unfinished calls as timed out.
+
+    Every backend call reports to its tool's circuit breaker in `health`
+    (shared by all engines and reports by default); while a breaker is
+    open, calls to that tool fail at once instead of waiting on it. Calls
+    running out of time under the deadline are not held against the tool:
+    one that would start past it raises DeadlineExceeded instead.
+
+    aresearch() is the same for coroutines: calls run as tasks on the
+    caller's event loop, awaiting the tool's coroutine from `async_tools`
+    when it has one and running its callable on the pool otherwise.
+    Per-tool limits then apply per event loop.
+    """
+
+    def __init__(self, tools: Mapping[str, Callable[[str], str]],
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 tool_limits: Optional[Mapping[str, int]] = None,
+                 hedge_percentile: float = HEDGE_PERCENTILE, hedge_min_samples: int = HEDGE_MIN_SAMPLES,
+                 health: Optional[HealthRegistry] = None,
+                 async_tools: Optional[Mapping[str, Callable[[str], Awaitable[str]]]] = None):
+        self.tools = dict(tools)
+        self.async_tools = dict(async_tools or {})
+        self.health = health or tool_health
+        self.max_concurrency = max(1, max_concurrency)
+        if tool_limits is None:
+            tool_limits = parse_tool_limits(DEFAULT_TOOL_LIMITS)
+        self.tool_limits = {name: min(limit, self.max_concurrency) for name, limit in tool_limits.items()}
+        self._tool_slots = {name: threading.BoundedSemaphore(limit) for name, limit in self.tool_limits.items()}
+        self._async_slots = weakref.WeakKeyDictionary()  # event loop -> {tool: asyncio.Semaphore}
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                            thread_name_prefix="research")
+        self._tool_executors = {name: ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"research-{name}")
+                                for name, limit in self.tool_limits.items()}
+        # Hedged calls run here while a research thread waits for the first answer;
+        # sized so no attempt ever queues behind another tool's
+        hedge_workers = sum(self.tool_limits.values()) + 2 * self.max_concurrency
+        self._hedge_executor = ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix="research-hedge")
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self._latencies: Dict[str, Deque[float]] = {}
+        self.stats = Counter()
+        self.flights = SingleFlight()
+        self._prefetched: Dict[Tuple[str, str], Tuple[float, Future]] = {}
+        self._lock = threading.Lock()
+
+    def _call(self, query: str, tool: str) -> ToolCall:
+        call = ToolCall(query=query, tool=tool)
+        func = self.tools.get(tool)
+        if func is None:
+            call.error = f"Unknown tool: {tool}"
+            return call
+
+        start = time.perf_counter()
+        try:
+            # Fail fast while the breaker is open; _run asks again once it holds a slot
+            self._admit(tool, probe=False)
+            call.output, call.cached = self.flights.do((tool, normalize_query(query)),
+                                                       lambda: self._run(tool, func, query))
+        except Exception as e:
+            call.error = str(e)
+            call.rejected = isinstance(e, CircuitOpenError)
+            call.timed_out = isinstance(e, DeadlineExceeded)
+        finally:
+            call.elapsed = time.perf_counter() - start
+        self._emit(call)
+        return call
+
+    async def _acall(self, query: str, tool: str) -> ToolCall:
+        call = ToolCall(query=query, tool=tool)
+        if tool not in self.tools and tool not in self.async_tools:
+            call.error = f"Unknown tool: {tool}"
+            return call
+
+        start = time.perf_counter()
+        try:
+            self._admit(tool, probe=False)
+            # Shielded: a caller that stops waiting must not cancel a call other reports share
+            call.output, call.cached = await asyncio.shield(
+                self.flights.ado((tool, normalize_query(query)), lambda: self._arun(tool, query)))
+        except Exception as e:
+            call.error = str(e)
+            call.rejected = isinstance(e, CircuitOpenError)
+            call.timed_out = isinstance(e, DeadlineExceeded)
+        finally:
+            call.elapsed = time.perf_counter() - start
+        self._emit(call)
+        return call
+
+    def _admit(self, tool: str, probe: bool = True, slot=None):
+        """Raise CircuitOpenError, releasing `slot`, when the tool's breaker refuses the call"""
+        if not self.health.breaker(tool).allow(probe=probe):
+            if slot is not None:
+                slot.release()
+            self._count("tool_circuit_rejected")
+            raise CircuitOpenError(tool)
+
+    def _emit(self, call: ToolCall):
+        trace = telemetry.current_trace()
+        if trace is not None:
+            trace.emit("tool", call.tool, duration=call.elapsed, query=call.query, error=call.error)
+
+    def _run(self, tool: str, func: Callable[[str], str], query: str) -> Tuple[str, bool]:
+        """Call the backend while holding one of the tool's slots, hedging it when slow.
+
+        Returns the output and whether the tool cache answered instead of the backend.
+        """
+        slot = self._tool_slots.get(tool)
+        if slot is not None:
+            slot.acquire()
+        # Calls queued for the slot may find the breaker tripped meanwhile
+        self._admit(tool, slot=slot)
+        delay = self.hedge_delay(tool)
+        if delay is None:
+            return self._attempt(tool, func, query, slot)
+
+        primary = self._hedge_executor.submit(copy_context().run, self._attempt, tool, func, query, slot)
+        if wait([primary], timeout=delay).done or (slot is not None and not slot.acquire(blocking=False)):
+            return primary.result()  # answered in time, or no spare slot for a duplicate
+        if not self.health.breaker(tool).allow():
+            if slot is not None:
+                slot.release()
+            return primary.result()  # tripped while the primary ran
+        self._count("tool_hedged")
+        hedge = self._hedge_executor.submit(copy_context().run, self._attempt, tool, func, query, slot)
+        attempts = {primary, hedge}
+        while attempts:
+            done, attempts = wait(attempts, return_when=FIRST_COMPLETED)
+            answered = [future for future in done if future.exception() is None]
+            if answered:
+                if primary not in answered:
+                    self._count("tool_hedge_won")
+                return answered[0].result()
+        return primary.result()  # both failed: raise the original error
+
+    def _attempt(self, tool: str, func: Callable[[str], str], query: str, slot) -> Tuple[str, bool]:
+        """One backend call; releases the slot acquired for it and reports to the tool's breaker"""
+        start = time.perf_counter()
+        ok = False
+        try:
+            self._check_deadline(tool)
+            with track_hits() as lookups:
+                output = func(query)
+            ok = self._outcome_ok(output, any(lookups))
+        finally:
+            # Record first, so calls waiting for the slot see the outcome
+            self._record(tool, ok)
+            if slot is not None:
+                slot.release()
+        return self._finished(tool, output, any(lookups), time.perf_counter() - start)
+
+    async def _arun(self, tool: str, query: str) -> Tuple[str, bool]:
+        """_run() for coroutines"""
+        slot = self._async_slot(tool)
+        if slot is not None:
+            await slot.acquire()
+        self._admit(tool, slot=slot)
+        delay = self.hedge_delay(tool)
+        if delay is None:
+            return await self._aattempt(tool, query, slot)
+
+        primary = asyncio.ensure_future(self._aattempt(tool, query, slot))
+        done, _ = await asyncio.wait([primary], timeout=delay)
+        if done or (slot is not None and slot.locked()):
+            return await primary  # answered in time, or no spare slot for a duplicate
+        if not self.health.breaker(tool).allow():
+            return await primary  # tripped while the primary ran
+        if slot is not None:
+            await slot.acquire()  # free, so this does not wait
+        self._count("tool_hedged")
+        hedge = asyncio.ensure_future(self._aattempt(tool, query, slot))
+        attempts = {primary, hedge}
+        while attempts:
+            done, attempts = await asyncio.wait(attempts, return_when=asyncio.FIRST_COMPLETED)
+            answered = [task for task in done if not task.cancelled() and task.exception() is None]
+            if answered:
+                if primary not in answered:
+                    self._count("tool_hedge_won")
+                return answered[0].result()
+        return primary.result()  # both failed: raise the original error
+
+    async def _aattempt(self, tool: str, query: str, slot) -> Tuple[str, bool]:
+        """_attempt() for coroutines; tools without a coroutine run on the pool"""
+        start = time.perf_counter()
+        ok = False
+        try:
+            self._check_deadline(tool)
+            coroutine = self.async_tools.get(tool)
+            with track_hits() as lookups:
+                if coroutine is not None:
+                    output = await coroutine(query)
+                else:
+                    output = await asyncio.get_running_loop().run_in_executor(
+                        self._executor, copy_context().run, self.tools[tool], query)
+            ok = self._outcome_ok(output, any(lookups))
+        except asyncio.CancelledError:
+            ok = None  # abandoned, not the tool's fault
+            raise
+        finally:
+            self._record(tool, ok)
+            if slot is not None:
+                slot.release()
+        return self._finished(tool, output, any(lookups), time.perf_counter() - start)
+
+    def _check_deadline(self, tool: str):
+        """Raise DeadlineExceeded instead of starting a call after the deadline"""
+        if deadlines.passed():
+            raise DeadlineExceeded(f"deadline passed before {tool} was called")
+
+    @staticmethod
+    def _outcome_ok(output, cached: bool) -> Optional[bool]:
+        """Whether a call that returned succeeded; None for cache hits, which say nothing about the backend"""
+        if cached:
+            return None
+        # Tools report failures as "Error..." strings as well as exceptions
+        return not (isinstance(output, str) and output.startswith("Error"))
+
+    def _finished(self, tool: str, output: str, cached: bool, elapsed: float) -> Tuple[str, bool]:
+        # Only backend calls count toward the hedge delay; cache hits would drag it to microseconds
+        if not cached:
+            self._timed(tool, elapsed)
+        return output, cached
+
+    def _record(self, tool: str, ok: Optional[bool]):
+        """Report a call's outcome to the tool's breaker, unless it was abandoned or ran out of time.
+
+        A failure past the deadline most likely had its timeout cut short by
+        the deadline, so it says nothing about the tool's health.
+        """
+        if ok is None or (not ok and deadlines.passed()):
+            return
+        self.health.breaker(tool).record(ok)
+
+    def _async_slot(self, tool: str) -> Optional[asyncio.Semaphore]:
+        limit = self.tool_limits.get(tool)
+        if limit is None:
+            return None
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            slots = self._async_slots.get(loop)
+            if slots is None:
+                slots = self._async_slots[loop] = {}
+            slot = slots.get(tool)
+            if slot is None:
+                slot = slots[tool] = asyncio.Semaphore(limit)
+            return slot
+
+    def _timed(self, tool: str, elapsed: float):
+        with self._lock:
+            latencies = self._latencies.get(tool)
+            if latencies is None:
+                latencies = self._latencies[tool] = deque(maxlen=HEDGE_WINDOW)
+            latencies.append(elapsed)
+
+    def hedge_delay(self, tool: str) -> Optional[float]:
+        """Seconds after which a call to `tool` gets a duplicate, once enough calls were timed"""
+        if self.hedge_percentile <= 0:
+            return None
+        with self._lock:
+            latencies = sorted(self._latencies.get(tool, ()))
+        if len(latencies) < self.hedge_min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.hedge_percentile / 100))]
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+        telemetry.count(name)
+
+    def _submit(self, query: str, tool: str) -> Future:
+        # Each call runs in a copy of the caller's context so it reports to the caller's trace
+        executor = self._tool_executors.get(tool, self._executor)
+        return executor.submit(copy_context().run, self._call, query, tool)
+
+    def _claim(self, query: str, tool: str) -> Optional[Future]:
+        with self._lock:
+            entry = self._prefetched.pop((tool, normalize_query(query)), None)
+        if entry is None or entry[1].cancelled():
+            return None
+        telemetry.count("research_prefetch_used")
+        return entry[1]
+
+    def prefetch(self, query: str, tool_names: Sequence[str]) -> List[Tuple[str, str]]:
+        """Start the query's tool calls now, for a research() that will ask for them later.
+
+        Returns the (tool, normalized query) keys to pass to cancel().
+        """
+        keys = []
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (started, _) in self._prefetched.items() if now - started > PREFETCH_TTL]
+            for key in expired:
+                self._prefetched.pop(key)[1].cancel()
+            for tool in tool_names:
+                key = (tool, normalize_query(query))
+                if key not in self._prefetched:
+                    self._prefetched[key] = (now, self._submit(query, tool))
+                keys.append(key)
+        return keys
+
+    def cancel(self, keys: Iterable[Tuple[str, str]]) -> int:
+        """Drop prefetched calls; queued ones never run, running ones finish unclaimed.
+
+        Returns how many were dropped.
+        """
+        dropped = 0
+        with self._lock:
+            for key in keys:
+                entry = self._prefetched.pop(key, None)
+                if entry is not None:
+                    entry[1].cancel()
+                    dropped += 1
+        return dropped
+
+    def research(self, plan: Sequence[Tuple[str, Sequence[str]]],
+                 deadline: Optional[float] = None) -> List[List[ToolCall]]:
+        """Run every (query, tool) pair in `plan` concurrently.
+
+        Results come back in the order of `plan`, and within each query in
+        the order its tools were listed. Calls unfinished at `deadline`
+        (epoch seconds; defaults to the context's deadline) come back with
+        timed_out set; they keep running in the background but are not
+        waited for.
+        """
+        futures = [
+            [self._claim(query, tool) or self._submit(query, tool) for tool in tool_names]
+            for query, tool_names in plan
+        ]
+        if deadline is None:
+            deadline = deadlines.current_deadline()
+        timeout = None if deadline is None else max(0.0, deadline - time.time())
+        wait([future for row in futures for future in row], timeout=timeout)
+        return [
+            [self._outcome(future, query, tool) for future, tool in zip(row, tool_names)]
+            for row, (query, tool_names) in zip(futures, plan)
+        ]
+
+    async def aresearch(self, plan: Sequence[Tuple[str, Sequence[str]]],
+                        deadline: Optional[float] = None) -> List[List[ToolCall]]:
+        """research() for coroutines, without holding a thread while calls run"""
+        futures = [
+            [self._aclaim(query, tool) for tool in tool_names]
+            for query, tool_names in plan
+        ]
+        if deadline is None:
+            deadline = deadlines.current_deadline()
+        timeout = None if deadline is None else max(0.0, deadline - time.time())
+        pending = [future for row in futures for future in row]
+        if pending:
+            await asyncio.wait(pending, timeout=timeout)
+        return [
+            [self._outcome(future, query, tool) for future, tool in zip(row, tool_names)]
+            for row, (query, tool_names) in zip(futures, plan)
+        ]
+
+    def _aclaim(self, query: str, tool: str) -> asyncio.Future:
+        prefetched = self._claim(query, tool)
+        if prefetched is not None:
+            return asyncio.wrap_future(prefetched)
+        return asyncio.ensure_future(self._acall(query, tool))
+
+    def _outcome(self, future: Future, query: str, tool: str) -> ToolCall:
+        if future.done() and not future.cancelled():
+            call = future.result()
+            if call.timed_out:
+                self._count("tool_deadline_exceeded")
+            return call
+        future.cancel()  # stops queued calls; running ones finish unclaimed
+        self._count("tool_deadline_exceeded")
+        return ToolCall(query=query, tool=tool, error="deadline exceeded", timed_out=True)
+
+    def shutdown(self, wait: bool = True):
+        for executor in [self._executor, *self._tool_executors.values(), self._hedge_executor]:
+            executor.shutdown(wait=wait)
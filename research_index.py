@@ -0,0 +1,79 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+import os
+import threading
+
+from chunk_store import ChunkStore
+from embeddings import EmbedFn, load_faiss
+
+
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "12"))
+
+
+@dataclass
+class ChunkHit:
+    """A retrieved research chunk; quacks like ResearchResult for pack_context"""
+    query: str
+    content: str
+    relevance_score: float
+    similarity: float
+
+
+class ResearchIndex:
+    """Vector index over one run's research, chunked and embedded once.
+
+    Chunks and their embeddings live in a ChunkStore; search goes through a
+    faiss-cpu inner-product index over the store's embedding matrix
+    (cosine similarity), or the store's vectorized scoring when faiss is
+    not installed.
+    """
+
+    def __init__(self, results: Iterable, embed_fn: Optional[EmbedFn] = None):
+        self.store = ChunkStore(embed_fn)
+        self.store.add_results(results)
+        self.index = None
+        faiss = load_faiss()
+        if faiss is not None and len(self.store):
+            vectors = self.store.embeddings
+            self.index = faiss.IndexFlatIP(vectors.shape[1])
+            self.index.add(vectors)
+
+    def __len__(self):
+        return len(self.store)
+
+    def search(self, text: str, k: int = RETRIEVAL_TOP_K) -> List[ChunkHit]:
+        """Top-k chunks by cosine similarity to `text`"""
+        if not len(self.store):
+            return []
+        if self.index is not None:
+            k = min(k, len(self.store))
+            scores, ids = self.index.search(self.store.embed_query(text).reshape(1, -1), k)
+            pairs = [(int(i), float(s)) for i, s in zip(ids[0], scores[0]) if i >= 0]
+        else:
+            pairs = self.store.top_k(text, k)
+        return [ChunkHit(self.store.query(i), self.store.text(i), self.store.prior(i), score) for i, score in pairs]
+
+
+class ResearchIndexRegistry:
+    """Per-run indexes keyed by thread_id, shared by that run's writer branches"""
+
+    def __init__(self):
+        self._indexes: Dict[str, ResearchIndex] = {}
+        self._lock = threading.Lock()
+
+    def build(self, thread_id: str, results: Iterable, embed_fn: Optional[EmbedFn] = None) -> ResearchIndex:
+        index = ResearchIndex(results, embed_fn)
+        with self._lock:
+            self._indexes[thread_id] = index
+        return index
+
+    def get(self, thread_id: str) -> Optional[ResearchIndex]:
+        with self._lock:
+            return self._indexes.get(thread_id)
+
+    def drop(self, thread_id: str):
+        with self._lock:
+            self._indexes.pop(thread_id, None)
+
+
+research_indexes = ResearchIndexRegistry()
@@ -0,0 +1,150 @@
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, List, Optional
+import asyncio
+import hashlib
+import json
+import threading
+
+
+def request_key(topic: str, user_context: str = "", **options) -> str:
+    """Key identical report requests share: normalized topic, context and options"""
+    normalized = [" ".join(topic.lower().split()), " ".join((user_context or "").lower().split()), options]
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """One in-flight execution and everything its waiters need to see"""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.done = False
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.events: List[Any] = []
+        self.waiters: List[tuple] = []  # (event loop, future) of coroutines waiting in ado()
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key (the leader) runs the work; callers that
+    arrive while it is in flight wait for it and get the same result or
+    exception. Nothing is kept once the leader finishes, so this is not a
+    cache: a later call with the same key runs again. Threads (do) and
+    coroutines (ado) share flights with each other.
+    """
+
+    def __init__(self):
+        self.stats = Counter()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key: Hashable):
+        """Return (flight, is_leader) for `key`"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.stats["shared"] += 1
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            self.stats["executed"] += 1
+            return flight, True
+
+    def _land(self, key: Hashable, flight: _Flight, result=None, error: Optional[BaseException] = None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        with flight.cond:
+            flight.result = result
+            flight.error = error
+            flight.done = True
+            flight.cond.notify_all()
+            waiters, flight.waiters = flight.waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Return fn(), or the result of the identical call already in flight"""
+        flight, leader = self._join(key)
+        if leader:
+            try:
+                result = fn()
+            except BaseException as e:
+                self._land(key, flight, error=e)
+                raise
+            self._land(key, flight, result=result)
+            return result
+
+        with flight.cond:
+            flight.cond.wait_for(lambda: flight.done)
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async do(): await fn(), or wait on the event loop for the identical call in flight"""
+        flight, leader = self._join(key)
+        if leader:
+            try:
+                result = await fn()
+            except BaseException as e:
+                self._land(key, flight, error=e)
+                raise
+            self._land(key, flight, result=result)
+            return result
+
+        with flight.cond:
+            waiter = None if flight.done else asyncio.get_running_loop().create_future()
+            if waiter is not None:
+                flight.waiters.append((waiter.get_loop(), waiter))
+        if waiter is not None:
+            await waiter
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def stream(self, key: Hashable, fn: Callable[[], Iterator[Any]]) -> Iterator[Any]:
+        """Yield fn()'s items; identical concurrent streams replay the leader's.
+
+        Followers that join late first replay what the leader has already
+        produced. If the leader stops early, followers end where it stopped.
+        Streams land no result, so keep them on their own SingleFlight
+        rather than sharing keys with do() and ado().
+        """
+        flight, leader = self._join(key)
+        if leader:
+            error = None
+            try:
+                for item in fn():
+                    with flight.cond:
+                        flight.events.append(item)
+                        flight.cond.notify_all()
+                    yield item
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                self._land(key, flight, error=error)
+            return
+
+        cursor = 0
+        while True:
+            with flight.cond:
+                flight.cond.wait_for(lambda: flight.done or len(flight.events) > cursor)
+                items = flight.events[cursor:]
+                done = flight.done
+            cursor += len(items)
+            yield from items
+            if done and cursor >= len(flight.events):
+                break
+        if flight.error is not None and not isinstance(flight.error, GeneratorExit):
+            raise flight.error
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+
+def _wake(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
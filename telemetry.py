@@ -0,0 +1,326 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+import inspect
+import json
+import os
+import threading
+import time
+
+
+# Append every event as a JSON line here (off when empty)
+TELEMETRY_FILE = os.getenv("TELEMETRY_FILE", "")
+# Serve Prometheus metrics on this port when prometheus_client is installed (off when 0)
+TELEMETRY_PROMETHEUS_PORT = int(os.getenv("TELEMETRY_PROMETHEUS_PORT", "0"))
+
+Sink = Callable[[Dict[str, Any]], None]
+
+_current_trace: ContextVar[Optional["RunTrace"]] = ContextVar("research_trace", default=None)
+_llm_handler: ContextVar[Optional[Any]] = ContextVar("research_trace_llm_handler", default=None)
+
+
+class RunTrace:
+    """Timing, token and counter events for one report run.
+
+    Events are dicts with "ts", "thread_id", "kind" (node, tool, llm,
+    report; process-wide events such as circuit have no thread_id) and
+    "name", plus kind-specific fields such as "duration".
+    They are kept for summary() and passed to every sink as they happen.
+    """
+
+    def __init__(self, thread_id: str, sinks: List[Sink]):
+        self.thread_id = thread_id
+        self.started = time.time()
+        self.events: List[Dict[str, Any]] = []
+        self.counters = Counter()
+        self._sinks = sinks
+        self._lock = threading.Lock()
+        self._llm_handler = None
+
+    def emit(self, kind: str, name: str, **fields) -> Dict[str, Any]:
+        event = {"ts": time.time(), "thread_id": self.thread_id, "kind": kind, "name": name, **fields}
+        with self._lock:
+            self.events.append(event)
+        for sink in self._sinks:
+            try:
+                sink(event)
+            except Exception:
+                pass  # telemetry must never break a report
+        return event
+
+    def count(self, name: str, amount: float = 1):
+        with self._lock:
+            self.counters[name] += amount
+        for sink in self._sinks:
+            counted = getattr(sink, "count", None)
+            if counted is not None:
+                try:
+                    counted(name, amount)
+                except Exception:
+                    pass
+
+    @property
+    def llm_handler(self):
+        if self._llm_handler is None:
+            self._llm_handler = _make_llm_handler(self)
+        return self._llm_handler
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-report totals: wall time per node and tool, LLM tokens and TTFT, counters"""
+        with self._lock:
+            events = list(self.events)
+            counters = dict(self.counters)
+        groups = {"node": defaultdict(list), "tool": defaultdict(list)}
+        llm = [e for e in events if e["kind"] == "llm"]
+        for event in events:
+            if event["kind"] in groups:
+                groups[event["kind"]][event["name"]].append(event)
+
+        def totals(items):
+            durations = [e["duration"] for e in items]
+            return {"calls": len(items), "seconds": round(sum(durations), 4),
+                    "max_seconds": round(max(durations), 4), "errors": sum(1 for e in items if e.get("error"))}
+
+        ttfts = [e["ttft"] for e in llm if e.get("ttft") is not None]
+        return {
+            "wall_seconds": round(time.time() - self.started, 4),
+            "nodes": {name: totals(items) for name, items in groups["node"].items()},
+            "tools": {name: totals(items) for name, items in groups["tool"].items()},
+            "llm": {
+                "calls": len(llm),
+                "errors": sum(1 for e in llm if e.get("error")),
+                "seconds": round(sum(e["duration"] for e in llm), 4),
+                "prompt_tokens": sum(e.get("prompt_tokens") or 0 for e in llm),
+                "completion_tokens": sum(e.get("completion_tokens") or 0 for e in llm),
+                "avg_ttft_seconds": round(sum(ttfts) / len(ttfts), 4) if ttfts else None,
+            },
+            "counters": counters,
+        }
+
+
+def _make_llm_handler(trace: RunTrace):
+    """LangChain callback recording latency, TTFT and token usage of every chat model call"""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class LLMTelemetryHandler(BaseCallbackHandler):
+        # Cheap, so async runs call it on the event loop instead of a worker thread
+        run_inline = True
+
+        def __init__(self):
+            self._runs = {}
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            kwargs_ = (serialized or {}).get("kwargs", {})
+            model = kwargs_.get("model_name") or kwargs_.get("model") or (serialized or {}).get("name", "")
+            self._runs[run_id] = [time.perf_counter(), None, model]
+
+        def on_llm_new_token(self, token, *, run_id, **kwargs):
+            run = self._runs.get(run_id)
+            if run is not None and run[1] is None:
+                run[1] = time.perf_counter() - run[0]
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            run = self._runs.pop(run_id, None)
+            if run is None:
+                return
+            usage = {}
+            for generations in response.generations:
+                for generation in generations:
+                    usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+            if not usage:
+                token_usage = (response.llm_output or {}).get("token_usage") or {}
+                usage = {"input_tokens": token_usage.get("prompt_tokens"),
+                         "output_tokens": token_usage.get("completion_tokens")}
+            trace.emit("llm", run[2], duration=time.perf_counter() - run[0], ttft=run[1],
+                       prompt_tokens=usage.get("input_tokens"), completion_tokens=usage.get("output_tokens"))
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            run = self._runs.pop(run_id, None)
+            if run is not None:
+                trace.emit("llm", run[2], duration=time.perf_counter() - run[0], error=str(error))
+
+    return LLMTelemetryHandler()
+
+
+class JsonlSink:
+    """Appends each event to a local JSON Lines file; no collector needed"""
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, event: Dict[str, Any]):
+        line = json.dumps(event, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class PrometheusSink:
+    """Exports node, tool and LLM metrics for Prometheus to scrape"""
+
+    def __init__(self, port: int):
+        from prometheus_client import Counter as PromCounter, Gauge, Histogram, start_http_server
+
+        self.node_seconds = Histogram("research_node_seconds", "Wall time per graph node", ["node"])
+        self.tool_seconds = Histogram("research_tool_seconds", "Wall time per tool call", ["tool", "outcome"])
+        self.llm_seconds = Histogram("research_llm_seconds", "Chat model call latency", ["model"])
+        self.llm_ttft = Histogram("research_llm_ttft_seconds", "Chat model time to first token", ["model"])
+        self.llm_tokens = PromCounter("research_llm_tokens", "Chat model tokens", ["model", "kind"])
+        self.report_seconds = Histogram("research_report_seconds", "End-to-end report time", ["outcome"])
+        self.events = PromCounter("research_events", "Cache hits, retries and other counters", ["name"])
+        self.circuit_state = Gauge("research_tool_circuit_state", "Tool breaker: 0 closed, 1 half-open, 2 open", ["tool"])
+        start_http_server(port)
+
+    def __call__(self, event: Dict[str, Any]):
+        kind, name = event["kind"], event["name"]
+        if kind == "node":
+            self.node_seconds.labels(name).observe(event["duration"])
+        elif kind == "tool":
+            self.tool_seconds.labels(name, "error" if event.get("error") else "ok").observe(event["duration"])
+        elif kind == "llm":
+            self.llm_seconds.labels(name).observe(event["duration"])
+            if event.get("ttft") is not None:
+                self.llm_ttft.labels(name).observe(event["ttft"])
+            for field, label in (("prompt_tokens", "prompt"), ("completion_tokens", "completion")):
+                if event.get(field):
+                    self.llm_tokens.labels(name, label).inc(event[field])
+        elif kind == "report":
+            self.report_seconds.labels("error" if event.get("error") else "ok").observe(event["duration"])
+        elif kind == "circuit":
+            self.circuit_state.labels(name).set({"closed": 0, "half_open": 1, "open": 2}.get(event["state"], 0))
+
+    def count(self, name: str, amount: float):
+        self.events.labels(name).inc(amount)
+
+
+class Telemetry:
+    """Registry of per-run traces plus the process-wide sinks they report to"""
+
+    def __init__(self, sinks: Optional[List[Sink]] = None):
+        self.sinks: List[Sink] = list(sinks or [])
+        self._traces: Dict[str, RunTrace] = {}
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink: Sink):
+        self.sinks.append(sink)
+
+    def trace(self, thread_id: str) -> RunTrace:
+        with self._lock:
+            trace = self._traces.get(thread_id)
+            if trace is None:
+                trace = self._traces[thread_id] = RunTrace(thread_id, self.sinks)
+            return trace
+
+    def event(self, kind: str, name: str, **fields):
+        """Send a process-wide event (not tied to a run) to every sink"""
+        event = {"ts": time.time(), "thread_id": None, "kind": kind, "name": name, **fields}
+        for sink in self.sinks:
+            try:
+                sink(event)
+            except Exception:
+                pass
+
+    def finish(self, thread_id: str, error: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Emit the report event and forget the trace; returns its summary"""
+        with self._lock:
+            trace = self._traces.pop(thread_id, None)
+        if trace is None:
+            return None
+        summary = trace.summary()
+        trace.emit("report", thread_id, duration=summary["wall_seconds"], error=error, summary=summary)
+        return summary
+
+
+def _default_sinks() -> List[Sink]:
+    sinks = []
+    if TELEMETRY_FILE:
+        sinks.append(JsonlSink(TELEMETRY_FILE))
+    if TELEMETRY_PROMETHEUS_PORT:
+        try:
+            sinks.append(PrometheusSink(TELEMETRY_PROMETHEUS_PORT))
+        except ImportError:
+            pass
+    return sinks
+
+
+telemetry = Telemetry(_default_sinks())
+
+
+def current_trace() -> Optional[RunTrace]:
+    """Trace of the run executing in this context, if any"""
+    return _current_trace.get()
+
+
+def count(name: str, amount: float = 1):
+    """Bump a counter on the current run's trace; a no-op outside a run"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.count(name, amount)
+
+
+def _register_llm_hook():
+    from langchain_core.tracers.context import register_configure_hook
+    register_configure_hook(_llm_handler, inheritable=True)
+
+
+_hook_registered = False
+_hook_lock = threading.Lock()
+
+
+@contextmanager
+def _node_scope(name: str, config):
+    trace = telemetry.trace(config["configurable"]["thread_id"])
+    trace_token = _current_trace.set(trace)
+    handler_token = _llm_handler.set(trace.llm_handler)
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        trace.emit("node", name, duration=time.perf_counter() - start, error=error)
+        _llm_handler.reset(handler_token)
+        _current_trace.reset(trace_token)
+
+
+def traced_node(name: str, fn: Callable, afn: Optional[Callable] = None):
+    """Wrap a graph node so its wall time and its LLM calls land on the run's trace.
+
+    With `afn`, the node's coroutine version, this returns a runnable that
+    runs fn under invoke() and afn under ainvoke(); add it to the graph
+    with an explicit input_schema.
+    """
+    global _hook_registered
+    with _hook_lock:
+        if not _hook_registered:
+            _register_llm_hook()
+            _hook_registered = True
+
+    params = list(inspect.signature(fn).parameters.values())
+    takes_config = any(p.name == "config" for p in params)
+
+    def node(state, config):
+        with _node_scope(name, config):
+            return fn(state, config) if takes_config else fn(state)
+
+    node.__name__ = name
+    node.__doc__ = fn.__doc__
+    # LangGraph reads the node's input schema from its first parameter's annotation
+    if params and params[0].annotation is not inspect.Parameter.empty:
+        node.__annotations__ = {"state": params[0].annotation}
+    if afn is None:
+        return node
+
+    from langchain_core.runnables import RunnableLambda
+
+    async def anode(state, config):
+        with _node_scope(name, config):
+            return await (afn(state, config) if takes_config else afn(state))
+
+    return RunnableLambda(node, afunc=anode, name=name)
@@ -0,0 +1,90 @@
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, HealthRegistry
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(**options):
+    clock = Clock()
+    options = {"window": 10, "min_calls": 3, "error_rate": 0.5, "cooldown": 30, **options}
+    return CircuitBreaker("web_search", clock=clock, **options), clock
+
+
+def test_opens_once_the_window_holds_enough_failures():
+    breaker, _ = make_breaker()
+    breaker.record(False)
+    breaker.record(False)
+    assert breaker.state == CLOSED  # fewer than min_calls outcomes
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.snapshot()["rejected"] == 1
+
+
+def test_stays_closed_below_the_error_rate():
+    breaker, _ = make_breaker()
+    for ok in (True, True, False, True, False):
+        breaker.record(ok)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_half_open_lets_one_probe_through():
+    breaker, clock = make_breaker()
+    for _ in range(3):
+        breaker.record(False)
+    clock.now = 29.0
+    assert not breaker.allow()
+
+    clock.now = 30.0
+    # Peeking does not take the probe
+    assert breaker.allow(probe=False)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # probe already out
+    assert not breaker.allow(probe=False)
+
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens():
+    breaker, clock = make_breaker()
+    for _ in range(3):
+        breaker.record(False)
+    clock.now = 30.0
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert breaker.trips == 2
+    clock.now = 59.0
+    assert not breaker.allow()
+
+
+def test_lost_probe_is_replaced_after_a_cooldown():
+    breaker, clock = make_breaker()
+    for _ in range(3):
+        breaker.record(False)
+    clock.now = 30.0
+    assert breaker.allow()
+    clock.now = 59.0
+    assert not breaker.allow()
+    clock.now = 60.0
+    assert breaker.allow()
+
+
+def test_registry_shares_breakers_and_reports_changes():
+    changes = []
+    registry = HealthRegistry(min_calls=1, cooldown=30)
+    registry.listeners.append(lambda tool, state: changes.append((tool, state)))
+    assert registry.breaker("current_news") is registry.breaker("current_news")
+
+    registry.breaker("current_news").record(False)
+    assert changes == [("current_news", OPEN)]
+    assert registry.snapshot()["current_news"]["state"] == OPEN
@@ -0,0 +1,30 @@
+"""Importing agent stays cheap: clients and their heavy dependencies load on first use.
+
+benchmarks/import_time.py reports where the time goes; this only fails
+when a heavy dependency is imported at module level again.
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("faiss", "langchain_groq", "tiktoken")
+
+
+def imported_modules(module: str):
+    """Every module a cold `import module` loads, from `python -X importtime`"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    env.setdefault("GROQ_API_KEY", "test")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return {line.rsplit("|", 1)[-1].strip() for line in proc.stderr.splitlines() if line.startswith("import time:")}
+
+
+def test_agent_import_skips_heavy_modules():
+    modules = imported_modules("agent")
+    assert "agent" in modules
+    loaded = sorted(name for name in modules if name.split(".")[0] in HEAVY_MODULES)
+    assert not loaded, f"import agent pulled in {loaded}; import them where they are used"
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+
+import pytest
+
+from llm_scheduler import AdaptiveConcurrency, LLMScheduler, TokenBucket, retry_after
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RateLimited(Exception):
+    status_code = 429
+    retry_after = 2
+
+
+def test_token_bucket_spends_its_burst_then_waits():
+    clock = Clock()
+    bucket = TokenBucket(60, clock=clock, sleep=lambda seconds: None)  # 1 unit per second
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+    assert bucket.reserve(1) == pytest.approx(2.0)  # queued behind the first reservation
+    clock.now = 10.0
+    assert bucket.reserve(1) == 0.0
+
+
+def test_token_bucket_caps_requests_at_its_capacity():
+    clock = Clock()
+    bucket = TokenBucket(60, clock=clock, sleep=lambda seconds: None)
+    assert bucket.reserve(1000) == 0.0  # clamped to one minute's worth
+    assert bucket.reserve(30) == pytest.approx(30.0)
+
+
+def test_aimd_grows_by_one_per_window_and_halves_on_throttling():
+    limiter = AdaptiveConcurrency(initial=2, minimum=1, maximum=4)
+    for _ in range(2):
+        limiter.acquire()
+        limiter.release(success=True)
+    assert limiter.limit == pytest.approx(2.9, abs=0.05)
+
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == pytest.approx(1.45, abs=0.05)
+
+    for _ in range(3):
+        limiter.acquire()
+        limiter.release(throttled=True)
+    assert limiter.limit == 1.0  # never below the minimum
+
+
+def test_aimd_blocks_threads_at_the_limit():
+    limiter = AdaptiveConcurrency(initial=1, minimum=1, maximum=1)
+    limiter.acquire()
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+    thread.start()
+    assert not acquired.wait(0.1)
+    limiter.release()
+    assert acquired.wait(5)
+    thread.join()
+    assert limiter.in_flight == 1
+
+
+def test_aimd_wakes_coroutines_on_release():
+    limiter = AdaptiveConcurrency(initial=1, minimum=1, maximum=1)
+
+    async def main():
+        await limiter.aacquire()
+        waiter = asyncio.ensure_future(limiter.aacquire())
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        limiter.release()
+        await asyncio.wait_for(waiter, 5)
+
+    asyncio.run(main())
+    assert limiter.in_flight == 1
+
+
+def make_scheduler(**options):
+    sleeps = []
+    scheduler = LLMScheduler(rpm=0, tpm=0, concurrency=AdaptiveConcurrency(initial=2, minimum=1, maximum=4),
+                             sleep=sleeps.append, **options)
+    return scheduler, sleeps
+
+
+class Flaky:
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def invoke(self, messages, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def test_scheduler_retries_rate_limits_and_honours_retry_after():
+    scheduler, sleeps = make_scheduler()
+    runnable = Flaky(RateLimited())
+    assert scheduler.invoke(runnable, []) == "ok"
+    assert runnable.calls == 2
+    assert sleeps[0] >= 2  # at least the server's Retry-After
+    assert scheduler.stats["throttled"] == 1
+    assert scheduler.concurrency.in_flight == 0
+    assert scheduler.concurrency.limit == pytest.approx(2.0)  # halved to 1, then +1/1 on success
+
+
+def test_scheduler_does_not_retry_client_errors():
+    scheduler, _ = make_scheduler()
+    with pytest.raises(ValueError):
+        scheduler.invoke(Flaky(ValueError("bad request")), [])
+    assert scheduler.stats["failures"] == 1
+    assert scheduler.concurrency.in_flight == 0
+
+
+def test_scheduler_releases_its_slot_on_interrupt():
+    scheduler, _ = make_scheduler()
+    with pytest.raises(KeyboardInterrupt):
+        scheduler.invoke(Flaky(KeyboardInterrupt()), [])
+    assert scheduler.concurrency.in_flight == 0
+
+
+def test_retry_after_reads_seconds_from_the_response_headers():
+    class Response:
+        headers = {"retry-after": "7"}
+
+    error = Exception()
+    error.response = Response()
+    assert retry_after(error) == 7.0
+    assert retry_after(Exception()) is None
@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight, request_key
+
+
+def run_in_threads(count, target):
+    results = [None] * count
+    errors = [None] * count
+
+    def worker(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return "report"
+
+    threads, results, errors = run_in_threads(5, lambda: flights.do("key", work))
+    while flights.stats["executed"] + flights.stats["shared"] < 5:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["report"] * 5
+    assert errors == [None] * 5
+    assert len(calls) == 1
+    assert flights.stats == {"executed": 1, "shared": 4}
+    assert flights.in_flight() == 0
+
+
+def test_followers_get_the_leaders_exception():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def work():
+        release.wait(5)
+        raise ValueError("backend down")
+
+    threads, results, errors = run_in_threads(3, lambda: flights.do("key", work))
+    while flights.stats["executed"] + flights.stats["shared"] < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert all(isinstance(error, ValueError) for error in errors)
+
+
+def test_finished_calls_are_not_cached():
+    flights = SingleFlight()
+    calls = []
+    for _ in range(3):
+        flights.do("key", lambda: calls.append(1))
+    assert len(calls) == 3
+
+
+def test_coroutines_share_one_execution():
+    flights = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def main():
+        return await asyncio.gather(*(flights.ado("key", work) for _ in range(4)))
+
+    assert asyncio.run(main()) == [1, 1, 1, 1]
+    assert flights.stats == {"executed": 1, "shared": 3}
+
+
+def test_streams_replay_the_leaders_items():
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def events():
+        yield 1
+        started.set()
+        release.wait(5)
+        yield 2
+        yield 3
+
+    leader = []
+    thread = threading.Thread(target=lambda: leader.extend(flights.stream("key", events)))
+    thread.start()
+    started.wait(5)
+    follower = []
+    follower_thread = threading.Thread(target=lambda: follower.extend(flights.stream("key", events)))
+    follower_thread.start()
+    while flights.stats["shared"] < 1:
+        time.sleep(0.01)
+    release.set()
+    thread.join()
+    follower_thread.join()
+
+    assert leader == follower == [1, 2, 3]
+    assert flights.stats == {"executed": 1, "shared": 1}
+
+
+@pytest.mark.parametrize("a, b", [
+    (("Quantum  Computing", "Focus on hardware"), ("quantum computing", "focus on   HARDWARE")),
+])
+def test_request_key_normalizes_whitespace_and_case(a, b):
+    assert request_key(*a, variant="enhanced") == request_key(*b, variant="enhanced")
+    assert request_key(*a, variant="enhanced") != request_key(*a, variant="pipelined")
@@ -0,0 +1,182 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, List, Mapping, Optional
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import telemetry
+
+
+# Seconds a cached result stays fresh, per tool
+DEFAULT_TOOL_TTLS = {
+    "current_news": 60 * 60,              # news goes stale fast
+    "web_search": 24 * 60 * 60,
+    "wikipedia": 30 * 24 * 60 * 60,       # encyclopedic content barely moves
+}
+DEFAULT_TTL = 24 * 60 * 60
+
+TOOL_CACHE_PATH = os.getenv("TOOL_CACHE_PATH", os.path.join(".cache", "tool_cache.sqlite"))
+TOOL_CACHE_MAX_BYTES = int(os.getenv("TOOL_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Lookups noted for the caller inside track_hits(); a shared list, so contexts
+# copied from the caller's (tool wrappers run the function in one) note into it
+_lookups: ContextVar[Optional[List[bool]]] = ContextVar("tool_cache_lookups", default=None)
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace so trivial variants share an entry"""
+    return " ".join(query.lower().split())
+
+
+def cache_key(tool: str, query: str) -> str:
+    return hashlib.sha256(f"{tool}\0{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def track_hits():
+    """Yield a list that gets True for each wrapped tool call in the block the cache answered, False per miss"""
+    lookups = []
+    token = _lookups.set(lookups)
+    try:
+        yield lookups
+    finally:
+        _lookups.reset(token)
+
+
+def _note(hit: bool):
+    lookups = _lookups.get()
+    if lookups is not None:
+        lookups.append(hit)
+
+
+class ToolCache:
+    """Content-addressed SQLite cache for tool outputs.
+
+    Entries are keyed on the tool name and normalized query, expire after a
+    per-tool TTL, and the least recently used entries are evicted once the
+    stored values exceed `max_bytes`.
+    """
+
+    def __init__(self, path: str = TOOL_CACHE_PATH, max_bytes: int = TOOL_CACHE_MAX_BYTES,
+                 ttls: Optional[Mapping[str, float]] = None):
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TOOL_TTLS if ttls is None else ttls)
+        self.hits = Counter()
+        self.misses = Counter()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tool_cache (
+                key TEXT PRIMARY KEY,
+                tool TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tool_cache_accessed ON tool_cache (accessed)")
+        self._conn.commit()
+
+    def ttl(self, tool: str) -> float:
+        return self.ttls.get(tool, DEFAULT_TTL)
+
+    def get(self, tool: str, query: str) -> Optional[str]:
+        key = cache_key(tool, query)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM tool_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl(tool):
+                if row is not None:
+                    self._conn.execute("DELETE FROM tool_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses[tool] += 1
+                telemetry.count("tool_cache_misses")
+                return None
+            self._conn.execute("UPDATE tool_cache SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits[tool] += 1
+            telemetry.count("tool_cache_hits")
+            return row[0]
+
+    def put(self, tool: str, query: str, value: str):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tool_cache (key, tool, value, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (cache_key(tool, query), tool, value, size, now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM tool_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM tool_cache ORDER BY accessed ASC")
+        doomed = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM tool_cache WHERE key = ?", doomed)
+
+    def wrap(self, tool: str, func: Callable[[str], str]) -> Callable[[str], str]:
+        """Wrap a tool function so repeated queries skip the network"""
+        def cached(query: str) -> str:
+            value = self.get(tool, query)
+            _note(value is not None)
+            if value is not None:
+                return value
+            value = func(query)
+            # Tools report failures as "Error..." strings; never cache those
+            if isinstance(value, str) and not value.startswith("Error"):
+                self.put(tool, query, value)
+            return value
+
+        cached.__name__ = getattr(func, "__name__", tool)
+        cached.__doc__ = func.__doc__
+        return cached
+
+    def wrap_async(self, tool: str, coro: Callable[[str], Awaitable[str]]) -> Callable[[str], Awaitable[str]]:
+        """Async counterpart of wrap; SQLite work runs in a worker thread, off the event loop"""
+        async def cached(query: str) -> str:
+            value = await asyncio.to_thread(self.get, tool, query)
+            _note(value is not None)
+            if value is not None:
+                return value
+            value = await coro(query)
+            if isinstance(value, str) and not value.startswith("Error"):
+                await asyncio.to_thread(self.put, tool, query, value)
+            return value
+
+        cached.__name__ = getattr(coro, "__name__", tool)
+        cached.__doc__ = coro.__doc__
+        return cached
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM tool_cache")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Hit/miss counters per tool"""
+        tools = set(self.hits) | set(self.misses)
+        return {tool: {"hits": self.hits[tool], "misses": self.misses[tool]} for tool in sorted(tools)}
@@ -0,0 +1,154 @@
+from typing import Dict, List, Mapping, Optional, Sequence
+import os
+import re
+import threading
+
+import telemetry
+from research_engine import parse_tool_limits
+from tool_cache import normalize_query
+
+
+# Most calls each tool may make for one report ("tool=limit,...")
+TOOL_BUDGETS = os.getenv("TOOL_BUDGETS", "wikipedia=15,web_search=15,current_news=8")
+# A tool is skipped for a query when its expected value falls below this
+TOOL_MIN_SCORE = float(os.getenv("TOOL_MIN_SCORE", "0.3"))
+# Expected value lost per second of the tool's average latency
+TOOL_LATENCY_COST = float(os.getenv("TOOL_LATENCY_COST", "0.05"))
+# Weight of each new outcome in the running hit-rate and latency averages
+TOOL_STATS_ALPHA = float(os.getenv("TOOL_STATS_ALPHA", "0.1"))
+# Still call a skipped tool every Nth time, so its stats can recover (0 = never)
+TOOL_EXPLORE_EVERY = int(os.getenv("TOOL_EXPLORE_EVERY", "20"))
+
+NEWS_RE = re.compile(r"\b(current|latest|recent|recently|today|this (week|month|year)|news|announced?|20[2-9]\d)\b")
+REFERENCE_RE = re.compile(r"\b(what (is|are)|definition|define|history|overview|introduction|fundamentals?|"
+                          r"basics|principles?|concepts?|explained|origins?)\b")
+# Tool outputs that came back but hold nothing worth citing
+EMPTY_RESULT_RE = re.compile(r"^\s*(Error\b|No good .* found|No recent news found|No results found)", re.IGNORECASE)
+
+# Hit rates assumed per (tool, query kind) until outcomes are observed;
+# they reproduce the old fixed routing: encyclopedia and web always, news
+# only for current topics
+PRIOR_HIT_RATES = {
+    ("wikipedia", "news"): 0.5, ("wikipedia", "reference"): 0.9, ("wikipedia", "general"): 0.7,
+    ("web_search", "news"): 0.9, ("web_search", "reference"): 0.8, ("web_search", "general"): 0.9,
+    ("current_news", "news"): 0.8, ("current_news", "reference"): 0.1, ("current_news", "general"): 0.2,
+}
+DEFAULT_PRIOR = 0.5
+
+
+def query_kind(query: str) -> str:
+    """"news", "reference" or "general", from cheap keyword rules"""
+    text = normalize_query(query)
+    if NEWS_RE.search(text):
+        return "news"
+    if REFERENCE_RE.search(text):
+        return "reference"
+    return "general"
+
+
+def is_useful(output: Optional[str]) -> bool:
+    return bool(output and output.strip()) and not EMPTY_RESULT_RE.match(output)
+
+
+class ToolBudget:
+    """One report's remaining tool calls; each query is routed once per report"""
+
+    def __init__(self, limits: Mapping[str, int]):
+        self.remaining = dict(limits)
+        self.routes: Dict[str, List[str]] = {}
+
+
+class ToolRouter:
+    """Picks which tools to call for each query from their observed value.
+
+    Each (tool, query kind) keeps running averages of its hit rate (the
+    call returned something citable) and latency, starting from
+    PRIOR_HIT_RATES. A tool is called when hit rate minus latency cost
+    reaches `min_score`; the best tool is always called. Calls also draw
+    on a per-report budget, kept per thread_id until release().
+    """
+
+    def __init__(self, tools: Sequence[str], budgets: Optional[Mapping[str, int]] = None,
+                 min_score: float = TOOL_MIN_SCORE, latency_cost: float = TOOL_LATENCY_COST,
+                 alpha: float = TOOL_STATS_ALPHA, explore_every: int = TOOL_EXPLORE_EVERY):
+        self.tools = list(tools)
+        self.budgets = dict(parse_tool_limits(TOOL_BUDGETS) if budgets is None else budgets)
+        self.min_score = min_score
+        self.latency_cost = latency_cost
+        self.alpha = alpha
+        self.explore_every = explore_every
+        self._hit_rate: Dict[tuple, float] = {}
+        self._latency: Dict[tuple, float] = {}
+        self._calls: Dict[tuple, int] = {}
+        self._skips: Dict[tuple, int] = {}
+        self._runs: Dict[str, ToolBudget] = {}
+        self._lock = threading.Lock()
+
+    def score(self, tool: str, kind: str) -> float:
+        key = (tool, kind)
+        hit_rate = self._hit_rate.get(key, PRIOR_HIT_RATES.get(key, DEFAULT_PRIOR))
+        return hit_rate - self.latency_cost * self._latency.get(key, 0.0)
+
+    def route(self, query: str, thread_id: Optional[str] = None) -> List[str]:
+        """Tools to call for `query`, best first; the same answer for the whole report"""
+        kind = query_kind(query)
+        with self._lock:
+            budget = None
+            if thread_id is not None:
+                budget = self._runs.get(thread_id)
+                if budget is None:
+                    budget = self._runs[thread_id] = ToolBudget(self.budgets)
+                routed = budget.routes.get(normalize_query(query))
+                if routed is not None:
+                    return list(routed)
+
+            ranked = sorted(self.tools, key=lambda tool: self.score(tool, kind), reverse=True)
+            chosen = []
+            for tool in ranked:
+                if budget is not None and budget.remaining.get(tool, 1) <= 0:
+                    telemetry.count("tool_budget_exhausted")
+                    continue
+                if chosen and self.score(tool, kind) < self.min_score and not self._explore(tool, kind):
+                    telemetry.count("tool_router_skipped")
+                    continue
+                chosen.append(tool)
+                if budget is not None and tool in budget.remaining:
+                    budget.remaining[tool] -= 1
+            if budget is not None:
+                budget.routes[normalize_query(query)] = chosen
+            return list(chosen)
+
+    def _explore(self, tool: str, kind: str) -> bool:
+        if not self.explore_every:
+            return False
+        key = (tool, kind)
+        self._skips[key] = self._skips.get(key, 0) + 1
+        return self._skips[key] % self.explore_every == 0
+
+    def record(self, tool: str, query: str, output: Optional[str], elapsed: float):
+        """Fold one call's outcome into the tool's stats for this kind of query"""
+        key = (tool, query_kind(query))
+        hit = 1.0 if is_useful(output) else 0.0
+        with self._lock:
+            prior = self._hit_rate.get(key, PRIOR_HIT_RATES.get(key, DEFAULT_PRIOR))
+            self._hit_rate[key] = prior + self.alpha * (hit - prior)
+            latency = self._latency.get(key)
+            self._latency[key] = elapsed if latency is None else latency + self.alpha * (elapsed - latency)
+            self._calls[key] = self._calls.get(key, 0) + 1
+
+    def release(self, thread_id: str):
+        with self._lock:
+            self._runs.pop(thread_id, None)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Current hit rate, latency and score per "tool/kind" """
+        with self._lock:
+            return {
+                f"{tool}/{kind}": {
+                    "calls": self._calls.get((tool, kind), 0),
+                    "hit_rate": round(self._hit_rate.get((tool, kind), PRIOR_HIT_RATES.get((tool, kind), DEFAULT_PRIOR)), 3),
+                    "latency_seconds": round(self._latency.get((tool, kind), 0.0), 3),
+                    "score": round(self.score(tool, kind), 3),
+                }
+                for tool in self.tools for kind in ("news", "reference", "general")
+            }
@@ -0,0 +1,43 @@
+from typing import Callable, Dict
+import threading
+
+
+class WorkflowRegistry:
+    """Compile each graph variant once and share it across sessions.
+
+    Compiled LangGraph graphs are safe to invoke concurrently as long as
+    every request uses its own thread_id, so one instance per variant
+    serves all Streamlit sessions in the process.
+    """
+
+    def __init__(self):
+        self._builders: Dict[str, Callable] = {}
+        self._compiled: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, builder: Callable):
+        with self._lock:
+            self._builders[name] = builder
+            self._compiled.pop(name, None)
+
+    def get(self, name: str):
+        compiled = self._compiled.get(name)
+        if compiled is not None:
+            return compiled
+        with self._lock:
+            # Another session may have compiled it while we waited
+            compiled = self._compiled.get(name)
+            if compiled is None:
+                if name not in self._builders:
+                    raise KeyError(f"Unknown workflow variant: {name}")
+                compiled = self._builders[name]()
+                self._compiled[name] = compiled
+            return compiled
+
+    def variants(self):
+        return sorted(self._builders)
+
+    def clear(self):
+        """Drop compiled graphs so the next get() rebuilds them"""
+        with self._lock:
+            self._compiled.clear()